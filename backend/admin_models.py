@@ -52,6 +52,14 @@ class ImageUploadResponse(BaseModel):
 
 
 class OrderStats(BaseModel):
+    totalOrders: int = 0
+    completedOrders: int = 0
+    cancelledOrders: int = 0
+    pendingOrders: int = 0
+    totalRevenue: float = 0.0
+    averageOrderValue: float = 0.0
+    todayOrders: int = 0
+    todayRevenue: float = 0.0
     pending: int = 0
     processing: int = 0
     shipped: int = 0
@@ -0,0 +1,209 @@
+"""
+Aggregates for the admin dashboard
+
+/admin/stats and /admin/orders/stats are polled by the dashboard and need
+the same handful of counters. They are computed in one conditional-
+aggregation pass over the order rollup plus one over `products` (with the category
+count as a scalar subquery), and shared through a short-TTL cache.
+
+Order counters and charts read the `daily_sales` rollup (see
+sales_rollup.py), so their cost does not grow with order history. Days
+follow the shop's `timezone` setting; created_at is stored as naive UTC.
+"""
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import case, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Product, Category, DailySales, Order, OrderItem, QuickOrder, SiteSettings
+
+logger = logging.getLogger(__name__)
+
+ADMIN_STATS_TTL = float(os.environ.get("ADMIN_STATS_TTL", "10"))
+DEFAULT_TIMEZONE = "Europe/Kiev"
+MAX_CHART_DAYS = 366
+
+# Order statuses in workflow order; anything else is reported after these
+ORDER_STATUSES = ("pending", "confirmed", "processing", "shipped", "delivered", "cancelled")
+# Statuses counted as "pending" on the orders statistics page
+OPEN_STATUSES = ("pending", "confirmed", "processing")
+LOW_STOCK_THRESHOLD = 10
+
+
+# ============ SHOP TIMEZONE ============
+
+async def shop_timezone(db: AsyncSession) -> ZoneInfo:
+    """The `timezone` site setting (Europe/Kiev by default)"""
+    result = await db.execute(select(SiteSettings.settings_data).where(SiteSettings.id == "main"))
+    settings_data = result.scalar_one_or_none() or {}
+    name = settings_data.get("timezone") or DEFAULT_TIMEZONE
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown shop timezone {name!r}, using {DEFAULT_TIMEZONE}")
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def local_today(tz: ZoneInfo) -> date:
+    return datetime.now(tz).date()
+
+
+def to_local_date(utc_naive: datetime, tz: ZoneInfo) -> date:
+    return utc_naive.replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+
+# ============ DASHBOARD COUNTERS ============
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+async def _order_aggregates(db: AsyncSession, today: date) -> dict:
+    """Order counters from the daily_sales rollup (one row per day and status)"""
+    is_today = DailySales.date == today
+    result = await db.execute(
+        select(
+            DailySales.status,
+            func.sum(DailySales.order_count).label("orders"),
+            func.sum(DailySales.revenue).label("revenue"),
+            _sum_if(is_today, DailySales.order_count).label("today_orders"),
+            _sum_if(is_today, DailySales.revenue).label("today_revenue"),
+        ).group_by(DailySales.status)
+    )
+
+    by_status = dict.fromkeys(ORDER_STATUSES, 0)
+    data = {
+        "total_orders": 0, "today_orders": 0, "total_amount": 0.0,
+        "delivered_amount": 0.0, "today_delivered_amount": 0.0,
+    }
+    for row in result:
+        status = row.status or "unknown"
+        by_status[status] = by_status.get(status, 0) + row.orders
+        data["total_orders"] += row.orders
+        data["total_amount"] += row.revenue
+        data["today_orders"] += row.today_orders
+        if status == "delivered":
+            data["delivered_amount"] += row.revenue
+            data["today_delivered_amount"] += row.today_revenue
+
+    data.update({status: by_status[status] for status in ORDER_STATUSES})
+    data["by_status"] = by_status
+    return data
+
+
+async def _product_aggregates(db: AsyncSession) -> dict:
+    """Product counters in one pass over `products`, plus the category count"""
+    row = (await db.execute(
+        select(
+            func.count().label("total_products"),
+            func.count(case((Product.stock < LOW_STOCK_THRESHOLD, 1))).label("low_stock_products"),
+            select(func.count()).select_from(Category).scalar_subquery().label("total_categories"),
+        ).select_from(Product)
+    )).one()
+    return dict(row._mapping)
+
+
+class DashboardAggregates:
+    """Short-TTL, per-process cache of the dashboard counters"""
+
+    def __init__(self, ttl: float = ADMIN_STATS_TTL):
+        self.ttl = ttl
+        self._cached: Optional[Tuple[float, dict]] = None
+
+    async def get(self, db: AsyncSession) -> dict:
+        if self._cached is not None and time.monotonic() - self._cached[0] < self.ttl:
+            return self._cached[1]
+
+        tz = await shop_timezone(db)
+        data = await _order_aggregates(db, local_today(tz))
+        data.update(await _product_aggregates(db))
+
+        self._cached = (time.monotonic(), data)
+        return data
+
+    def invalidate(self) -> None:
+        """Drop the cached counters (after an order is created or changes status)"""
+        self._cached = None
+
+
+dashboard_aggregates = DashboardAggregates()
+
+
+# ============ DAILY CHARTS ============
+
+async def daily_order_totals(db: AsyncSession, days: int) -> List[dict]:
+    """Per-day order count, revenue and delivered revenue for the last `days`
+    local days (oldest first, zero-filled), from the daily_sales rollup"""
+    tz = await shop_timezone(db)
+    today = local_today(tz)
+    first_day = today - timedelta(days=days - 1)
+
+    result = await db.execute(
+        select(
+            DailySales.date,
+            func.sum(DailySales.order_count).label("orders"),
+            func.sum(DailySales.revenue).label("revenue"),
+            _sum_if(DailySales.status == "delivered", DailySales.revenue).label("delivered_revenue"),
+        )
+        .where(DailySales.date >= first_day, DailySales.date <= today)
+        .group_by(DailySales.date)
+    )
+
+    totals: Dict[date, dict] = {
+        first_day + timedelta(days=i): {"orders": 0, "revenue": 0.0, "delivered_revenue": 0.0}
+        for i in range(days)
+    }
+    for row in result:
+        totals[row.date] = {
+            "orders": row.orders,
+            "revenue": float(row.revenue),
+            "delivered_revenue": float(row.delivered_revenue),
+        }
+
+    return [{"date": day.isoformat(), **values} for day, values in totals.items()]
+
+
+# ============ TOP PRODUCTS ============
+
+async def top_products(db: AsyncSession, limit: int) -> List[dict]:
+    """Best-selling products by units sold (order lines plus quick orders,
+    cancelled orders excluded), grouped over the product_id indexes"""
+    lines = union_all(
+        select(
+            OrderItem.product_id,
+            OrderItem.product_name.label("name"),
+            OrderItem.quantity,
+            (OrderItem.quantity * OrderItem.unit_price).label("amount"),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status != "cancelled"),
+        select(
+            QuickOrder.product_id,
+            QuickOrder.product_name.label("name"),
+            QuickOrder.quantity,
+            (QuickOrder.quantity * QuickOrder.price).label("amount"),
+        )
+        .where(QuickOrder.status != "cancelled"),
+    ).subquery()
+
+    sales = func.sum(lines.c.quantity)
+    result = await db.execute(
+        select(
+            lines.c.product_id,
+            func.max(lines.c.name).label("name"),
+            sales.label("sales"),
+            func.sum(lines.c.amount).label("revenue"),
+        )
+        .group_by(lines.c.product_id)
+        .order_by(sales.desc(), lines.c.product_id)
+        .limit(limit)
+    )
+    return [
+        {"id": row.product_id, "name": row.name, "sales": row.sales, "revenue": float(row.revenue or 0)}
+        for row in result
+    ]
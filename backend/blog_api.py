@@ -4,14 +4,16 @@ Blog API endpoints for CMS
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, func
-from database import get_db, BlogPost, MenuItem
+from database import get_db, get_read_db, read_db, get_write_db, write_session, BlogPost, MenuItem
+from serialization import ORJSONResponse
+from response_cache import cached, invalidates
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 import re
 
-blog_router = APIRouter(prefix="/api/blog", tags=["Blog"])
-menu_router = APIRouter(prefix="/api/menu", tags=["Menu"])
+blog_router = APIRouter(prefix="/api/blog", tags=["Blog"], default_response_class=ORJSONResponse)
+menu_router = APIRouter(prefix="/api/menu", tags=["Menu"], default_response_class=ORJSONResponse)
 
 
 # ============ PYDANTIC MODELS ============
@@ -68,11 +70,12 @@ def generate_slug(title: str) -> str:
 # ============ BLOG ENDPOINTS ============
 
 @blog_router.get("/posts", response_model=List[dict])
+@cached("blog")
 async def get_blog_posts(
     published_only: bool = True,
     limit: int = 50,
     offset: int = 0,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all blog posts"""
     query = select(BlogPost)
@@ -86,7 +89,7 @@ async def get_blog_posts(
     result = await db.execute(query)
     posts = result.scalars().all()
     
-    return [
+    return ORJSONResponse([
         {
             "id": post.id,
             "slug": post.slug,
@@ -104,7 +107,7 @@ async def get_blog_posts(
             "updated_at": post.updated_at
         }
         for post in posts
-    ]
+    ])
 
 @blog_router.get("/posts/{slug}")
 async def get_blog_post(slug: str, db: AsyncSession = Depends(get_db)):
@@ -117,13 +120,14 @@ async def get_blog_post(slug: str, db: AsyncSession = Depends(get_db)):
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    # Increment views
-    await db.execute(
-        update(BlogPost)
-        .where(BlogPost.slug == slug)
-        .values(views=post.views + 1)
-    )
-    await db.commit()
+    # Increment views in a separate short write transaction
+    async with write_session() as write_db:
+        await write_db.execute(
+            update(BlogPost)
+            .where(BlogPost.id == post.id)
+            .values(views=BlogPost.views + 1)
+        )
+        await write_db.commit()
     
     return {
         "id": post.id,
@@ -143,9 +147,10 @@ async def get_blog_post(slug: str, db: AsyncSession = Depends(get_db)):
     }
 
 @blog_router.post("/posts")
+@invalidates("blog")
 async def create_blog_post(
     post_data: BlogPostCreate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Create new blog post"""
     # Generate slug
@@ -176,10 +181,11 @@ async def create_blog_post(
     }
 
 @blog_router.put("/posts/{post_id}")
+@invalidates("blog")
 async def update_blog_post(
     post_id: str,
     post_data: BlogPostUpdate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update blog post"""
     update_data = post_data.dict(exclude_unset=True)
@@ -198,9 +204,10 @@ async def update_blog_post(
     return {"message": "Blog post updated successfully"}
 
 @blog_router.delete("/posts/{post_id}")
+@invalidates("blog")
 async def delete_blog_post(
     post_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Delete blog post"""
     await db.execute(
@@ -214,7 +221,8 @@ async def delete_blog_post(
 # ============ MENU ENDPOINTS ============
 
 @menu_router.get("/items", response_model=List[dict])
-async def get_menu_items(db: AsyncSession = Depends(get_db)):
+@cached("menu")
+async def get_menu_items(db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get all menu items"""
     result = await db.execute(
         select(MenuItem)
@@ -223,7 +231,7 @@ async def get_menu_items(db: AsyncSession = Depends(get_db)):
     )
     items = result.scalars().all()
     
-    return [
+    return ORJSONResponse([
         {
             "id": item.id,
             "title": item.title,
@@ -234,12 +242,13 @@ async def get_menu_items(db: AsyncSession = Depends(get_db)):
             "parent_id": item.parent_id
         }
         for item in items
-    ]
+    ])
 
 @menu_router.post("/items")
+@invalidates("menu")
 async def create_menu_item(
     item_data: MenuItemCreate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Create menu item"""
     item = MenuItem(**item_data.dict())
@@ -249,10 +258,11 @@ async def create_menu_item(
     return {"message": "Menu item created successfully", "id": item.id}
 
 @menu_router.put("/items/{item_id}")
+@invalidates("menu")
 async def update_menu_item(
     item_id: str,
     item_data: MenuItemUpdate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update menu item"""
     update_data = item_data.dict(exclude_unset=True)
@@ -267,9 +277,10 @@ async def update_menu_item(
     return {"message": "Menu item updated successfully"}
 
 @menu_router.delete("/items/{item_id}")
+@invalidates("menu")
 async def delete_menu_item(
     item_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Delete menu item"""
     await db.execute(
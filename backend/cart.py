@@ -0,0 +1,135 @@
+"""
+Cart writes
+
+Adding products to a cart is a single statement, for one product or a batch:
+
+    INSERT INTO cart (...) SELECT ... FROM products WHERE id IN (...)
+    ON CONFLICT (user_id, product_id)
+        DO UPDATE SET quantity = cart.quantity + excluded.quantity
+    RETURNING ...
+
+The product lookup, insert-or-increment and read-back happen in one round
+trip, and concurrent adds of the same product (double clicks) add up on the
+unique (user_id, product_id) index instead of creating duplicate rows.
+
+Cart reads join `products`, so they show current names, prices and stock
+(the cart row keeps the values from add time for deleted products).
+"""
+import uuid
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import DateTime, case, func, literal, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from checkout import DEFAULT_STOCK, ProductNotFound, merge_quantities
+from database import CartItem, Product, SiteSettings, insert_for
+
+# Same as the default `freeDeliveryFrom` site setting
+DEFAULT_FREE_DELIVERY_FROM = 1000
+
+
+async def add_cart_items(db: AsyncSession, user_id: str, items: Iterable[Tuple[str, int]]) -> List[Row]:
+    """Add (product_id, quantity) pairs to a cart; returns the cart rows in
+    request order. Raises ProductNotFound (nothing is committed; roll back)."""
+    quantities = merge_quantities(items)
+    if not quantities:
+        return []
+
+    cart = CartItem.__table__
+    new_ids = {product_id: str(uuid.uuid4()) for product_id in quantities}
+    products = select(
+        case(new_ids, value=Product.id),
+        Product.id,
+        Product.name,
+        Product.image,
+        Product.price,
+        case(quantities, value=Product.id),
+        literal(user_id),
+        literal(datetime.utcnow(), DateTime),
+    ).where(Product.id.in_(list(quantities)))
+
+    insert = insert_for(db.get_bind().dialect.name)
+    stmt = insert(cart).from_select(
+        ["id", "product_id", "product_name", "product_image", "price", "quantity", "user_id", "updated_at"],
+        products,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[cart.c.user_id, cart.c.product_id],
+        set_={
+            "quantity": cart.c.quantity + stmt.excluded.quantity,
+            "product_name": stmt.excluded.product_name,
+            "product_image": stmt.excluded.product_image,
+            "price": stmt.excluded.price,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(*cart.c)
+    rows = {row.product_id: row for row in await db.execute(stmt)}
+
+    unknown = [product_id for product_id in quantities if product_id not in rows]
+    if unknown:
+        raise ProductNotFound(f"Product not found: {', '.join(unknown)}")
+    return [rows[product_id] for product_id in quantities]
+
+
+# ============ READS ============
+
+async def cart_rows(db: AsyncSession, user_id: str) -> List[Row]:
+    """Cart rows with current product data, in one query (LEFT JOIN products)"""
+    result = await db.execute(
+        select(
+            CartItem.id,
+            CartItem.product_id,
+            CartItem.quantity,
+            CartItem.user_id,
+            func.coalesce(Product.name, CartItem.product_name).label("product_name"),
+            func.coalesce(Product.image, CartItem.product_image).label("product_image"),
+            func.coalesce(Product.price, CartItem.price).label("price"),
+            func.coalesce(Product.stock, DEFAULT_STOCK).label("stock"),
+            Product.id.isnot(None).label("available"),
+        )
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+    )
+    return result.all()
+
+
+async def free_delivery_from(db: AsyncSession) -> float:
+    """The `freeDeliveryFrom` site setting"""
+    result = await db.execute(select(SiteSettings.settings_data).where(SiteSettings.id == "main"))
+    settings_data = result.scalar_one_or_none() or {}
+    threshold = settings_data.get("freeDeliveryFrom")
+    return float(threshold if threshold is not None else DEFAULT_FREE_DELIVERY_FROM)
+
+
+async def cart_summary(db: AsyncSession, user_id: str) -> dict:
+    """Cart lines with totals and the free delivery threshold (CartSummary shape)"""
+    items = []
+    for row in await cart_rows(db, user_id):
+        available = bool(row.available)
+        stock = row.stock if available else 0
+        items.append({
+            "id": row.id,
+            "productId": row.product_id,
+            "productName": row.product_name,
+            "productImage": row.product_image,
+            "price": float(row.price),
+            "quantity": row.quantity,
+            "stock": stock,
+            "available": available,
+            "inStock": available and stock >= row.quantity,
+            "lineTotal": round(float(row.price) * row.quantity, 2) if available else 0.0,
+        })
+
+    subtotal = round(sum(item["lineTotal"] for item in items), 2)
+    threshold = await free_delivery_from(db)
+    return {
+        "userId": user_id,
+        "items": items,
+        "itemCount": sum(item["quantity"] for item in items if item["available"]),
+        "subtotal": subtotal,
+        "freeDeliveryFrom": threshold,
+        "amountToFreeDelivery": round(max(threshold - subtotal, 0.0), 2),
+        "freeDelivery": subtotal >= threshold,
+    }
@@ -0,0 +1,355 @@
+"""
+In-process read-only catalog snapshot for the public product endpoints
+
+Product reads outnumber writes by orders of magnitude, so listing,
+filtering, sorting, facets and single-product reads are served from an
+immutable, versioned snapshot instead of a fresh ORM query per request:
+
+- columnar numpy arrays: price, stock, discount, category codes, badge bitsets
+- presorted (key, id) orders for the name / price keyset sorts
+- pre-serialised JSON bytes per product (and for the category list),
+  shared with serialization.product_json so rebuilds only re-encode changed rows
+
+Writes to products/categories build a new snapshot and swap it in with a
+single reference assignment; readers keep whatever snapshot they started
+with. Checkout and order cancellation only change stock, so they swap in a
+copy with just the affected rows' stock (and JSON) patched instead of a
+full rebuild. Other worker processes pick changes up after
+CATALOG_SNAPSHOT_TTL.
+
+Set CATALOG_SNAPSHOT=0 to serve the product endpoints from SQL instead.
+"""
+import asyncio
+import copy
+import os
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Product, Category
+from facets import PRICE_BUCKETS, build_facets
+from pagination import InvalidCursor, decode_cursor, make_cursor
+from search_analysis import analyze
+from search_index import apply_search
+from serialization import decode_badges, product_json
+
+CATALOG_SNAPSHOT_ENABLED = os.environ.get("CATALOG_SNAPSHOT", "1") != "0"
+CATALOG_SNAPSHOT_TTL = float(os.environ.get("CATALOG_SNAPSHOT_TTL", "60"))
+
+
+class CatalogSnapshot:
+    """Immutable columnar view of all products and categories"""
+
+    def __init__(self, version: int, products: List[Product], categories: List[Category]):
+        self.version = version
+        self.built_at = time.monotonic()
+
+        n = len(products)
+        self.ids: List[str] = [p.id for p in products]
+        self.names: List[str] = [p.name for p in products]
+        self.row_of: Dict[str, int] = {pid: i for i, pid in enumerate(self.ids)}
+
+        self.price = np.fromiter((p.price or 0.0 for p in products), dtype=np.float64, count=n)
+        self.stock = np.fromiter((p.stock or 0 for p in products), dtype=np.int32, count=n)
+        self.discount = np.fromiter((p.discount or 0 for p in products), dtype=np.int32, count=n)
+
+        # Category names -> dense integer codes
+        self.category_names: List[str] = sorted({p.category for p in products})
+        code_of = {name: code for code, name in enumerate(self.category_names)}
+        self.category_codes = np.fromiter(
+            (code_of[p.category] for p in products), dtype=np.int32, count=n
+        )
+
+        # Badge names -> bit positions
+        product_badges = [decode_badges(p.badges) for p in products]
+        badge_names = sorted({b for badges in product_badges for b in badges})
+        self.badge_bits: Dict[str, int] = {name: 1 << i for i, name in enumerate(badge_names)}
+        self.badges = np.fromiter(
+            (sum(self.badge_bits[b] for b in set(badges)) for badges in product_badges),
+            dtype=np.int64, count=n,
+        )
+
+        # Presorted keyset orders: ascending (key, id) tuples plus row indices
+        self._sorted_keys: Dict[str, List[Tuple]] = {}
+        self._orders: Dict[str, np.ndarray] = {}
+        for sort_key, key_of in (("name", lambda p: p.name), ("price", lambda p: p.price)):
+            rows = sorted(range(n), key=lambda i: (key_of(products[i]), self.ids[i]))
+            self._sorted_keys[sort_key] = [(key_of(products[i]), self.ids[i]) for i in rows]
+            self._orders[sort_key] = np.array(rows, dtype=np.int64)
+
+        self.blobs: List[bytes] = [product_json.get(p) for p in products]
+        self.categories_json: bytes = orjson.dumps([
+            {"id": c.id, "name": c.name, "icon": c.icon, "count": c.count or 0}
+            for c in categories
+        ])
+
+    def with_stock_changes(self, version: int, deltas: Dict[str, int]) -> "CatalogSnapshot":
+        """Copy with the stock of a few products changed by the given deltas.
+
+        Only the stock array and the changed rows' JSON are copied; sort
+        orders, masks and the other blobs are shared with this snapshot.
+        """
+        patched = copy.copy(self)
+        patched.version = version
+        patched.stock = self.stock.copy()
+        patched.blobs = list(self.blobs)
+        for product_id, delta in deltas.items():
+            row = self.row_of.get(product_id)
+            if row is None:
+                continue
+            product = orjson.loads(self.blobs[row])
+            product["stock"] += delta
+            patched.stock[row] = product["stock"]
+            patched.blobs[row] = orjson.dumps(product)
+        return patched
+
+    # ============ FILTERING ============
+
+    def mask(
+        self,
+        hits: Optional[List[str]] = None,
+        category: Optional[str] = None,
+        badge: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> np.ndarray:
+        """Boolean row mask for the given filters"""
+        mask = np.ones(len(self.ids), dtype=bool)
+
+        if hits is not None:
+            hit_mask = np.zeros(len(self.ids), dtype=bool)
+            hit_mask[self.rows(hits)] = True
+            mask &= hit_mask
+
+        if category:
+            needle = category.lower()
+            codes = [c for c, name in enumerate(self.category_names) if needle in name.lower()]
+            mask &= np.isin(self.category_codes, codes)
+
+        if badge:
+            bit = self.badge_bits.get(badge, 0)
+            mask &= (self.badges & bit) != 0
+
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+
+        return mask
+
+    def rows(self, product_ids: List[str]) -> np.ndarray:
+        """Row indices of known product ids, in the given order"""
+        return np.fromiter(
+            (self.row_of[pid] for pid in product_ids if pid in self.row_of), dtype=np.int64
+        )
+
+    # ============ ORDERING / PAGINATION ============
+
+    def page(
+        self, mask: np.ndarray, sort_by: str, cursor: Optional[str], limit: int, skip: int = 0
+    ) -> Tuple[np.ndarray, Optional[str]]:
+        """One keyset page for name / price / -price; returns (rows, next cursor)"""
+        base = "price" if sort_by == "-price" else sort_by
+        keys = self._sorted_keys[base]
+        order = self._orders[base]
+
+        position = decode_cursor(cursor, sort_by) if cursor else None
+        if sort_by == "-price":
+            end = bisect_left(keys, tuple(position)) if position else len(keys)
+            candidates = order[:end][::-1]
+        else:
+            start = bisect_right(keys, tuple(position)) if position else 0
+            candidates = order[start:]
+
+        selected = candidates[mask[candidates]]
+        if skip and not cursor:
+            selected = selected[skip:]
+
+        rows = selected[:limit]
+        next_cursor = None
+        if len(selected) > limit:
+            last = int(rows[-1])
+            key = self.price[last].item() if base == "price" else self.names[last]
+            next_cursor = make_cursor(sort_by, key, self.ids[last])
+        return rows, next_cursor
+
+    def ranked(self, hits: List[str], mask: np.ndarray, limit: int, skip: int = 0) -> np.ndarray:
+        """Search hits in relevance order, restricted to the mask"""
+        ranked_rows = self.rows(hits)
+        ranked_rows = ranked_rows[mask[ranked_rows]]
+        return ranked_rows[skip:skip + limit]
+
+    # ============ OUTPUT ============
+
+    def render(self, rows: np.ndarray) -> bytes:
+        """JSON array of the given products from pre-serialised blobs"""
+        return b"[" + b",".join(self.blobs[i] for i in rows.tolist()) + b"]"
+
+    def product_json(self, product_id: str) -> Optional[bytes]:
+        """Pre-serialised JSON of one product, or None if not in the snapshot"""
+        row = self.row_of.get(product_id)
+        return None if row is None else self.blobs[row]
+
+    def facets(self, mask: np.ndarray) -> dict:
+        """Category, badge and price-bucket counts for the masked rows"""
+        prices = self.price[mask]
+        category_counts = np.bincount(
+            self.category_codes[mask], minlength=len(self.category_names)
+        )
+        badges = self.badges[mask]
+        buckets = np.bincount(
+            np.clip(np.searchsorted(PRICE_BUCKETS, prices, side="right") - 1, 0, None),
+            minlength=len(PRICE_BUCKETS),
+        )
+
+        return build_facets(
+            int(mask.sum()),
+            {name: int(c) for name, c in zip(self.category_names, category_counts) if c},
+            {name: int(np.count_nonzero(badges & bit)) for name, bit in self.badge_bits.items()
+             if np.count_nonzero(badges & bit)},
+            {i: int(c) for i, c in enumerate(buckets)},
+            float(prices.min()) if prices.size else None,
+            float(prices.max()) if prices.size else None,
+        )
+
+
+
+# ============ SNAPSHOT STORE ============
+
+class CatalogStore:
+    """Holds the current snapshot and swaps in rebuilt ones"""
+
+    def __init__(self, ttl: float = CATALOG_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._lock = asyncio.Lock()
+        # Set when stock changes while a rebuild is reading the database
+        self._changed_during_refresh = False
+
+    async def get(self, db: AsyncSession) -> CatalogSnapshot:
+        """Current snapshot, (re)built first if missing or older than the TTL"""
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.built_at > self.ttl:
+            return await self.refresh(db, stale=snapshot)
+        return snapshot
+
+    async def refresh(self, db: AsyncSession, stale: Optional[CatalogSnapshot] = None) -> CatalogSnapshot:
+        """Rebuild from the database and swap the new snapshot in.
+
+        With `stale`, skips the rebuild if another request already replaced it.
+        """
+        async with self._lock:
+            if stale is not None and self._snapshot is not stale:
+                return self._snapshot
+
+            self._changed_during_refresh = False
+            products = (await db.execute(select(Product))).scalars().all()
+            categories = (await db.execute(select(Category))).scalars().all()
+
+            self._version += 1
+            self._snapshot = CatalogSnapshot(self._version, products, categories)
+            if self._changed_during_refresh:
+                # The rows read may or may not include that change; rebuild on next read
+                self.expire()
+            return self._snapshot
+
+    def expire(self) -> None:
+        """Rebuild on next read"""
+        if self._snapshot is not None:
+            self._snapshot.built_at = float("-inf")
+
+    def adjust_stock(self, deltas: Dict[str, int]) -> None:
+        """Apply committed stock changes ({product_id: +/-quantity}) to the
+        current snapshot without rebuilding it"""
+        self._changed_during_refresh = True
+        if self._snapshot is None or not deltas:
+            return
+        self._version += 1
+        self._snapshot = self._snapshot.with_stock_changes(self._version, deltas)
+
+
+catalog = CatalogStore()
+
+
+async def products_by_ids(db: AsyncSession, product_ids: List[str]) -> bytes:
+    """JSON array of the given products in request order (unknown ids skipped).
+
+    Served from the snapshot when enabled; ids it does not have yet are
+    read with one IN (...) query.
+    """
+    blobs: Dict[str, bytes] = {}
+    if CATALOG_SNAPSHOT_ENABLED:
+        snapshot = await catalog.get(db)
+        for product_id in product_ids:
+            blob = snapshot.product_json(product_id)
+            if blob is not None:
+                blobs[product_id] = blob
+
+    missing = [product_id for product_id in product_ids if product_id not in blobs]
+    if missing:
+        result = await db.execute(select(Product).where(Product.id.in_(missing)))
+        for product in result.scalars():
+            blobs[product.id] = product_json.get(product)
+
+    return b"[" + b",".join(blobs[pid] for pid in product_ids if pid in blobs) + b"]"
+
+
+async def search_hits(db: AsyncSession, search: str) -> List[str]:
+    """Product ids matching a search, best match first (none without usable terms)"""
+    if not analyze(search):
+        return []
+    query, rank = apply_search(select(Product.id), search, db.get_bind().dialect.name)
+    if rank is not None:
+        query = query.order_by(rank.asc(), Product.name.asc(), Product.id.asc())
+    return list((await db.execute(query)).scalars().all())
+
+
+async def list_products(
+    db: AsyncSession,
+    search: Optional[str],
+    category: Optional[str],
+    badge: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    sort_by: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    skip: int = 0,
+) -> Tuple[bytes, Optional[str]]:
+    """Serve a product listing from the snapshot; returns (JSON body, next cursor)"""
+    snapshot = await catalog.get(db)
+    hits = await search_hits(db, search) if search else None
+    mask = snapshot.mask(hits, category, badge, min_price, max_price)
+
+    if sort_by is None:
+        sort_by = "relevance" if hits is not None else "name"
+
+    if sort_by == "relevance" and hits is not None:
+        if cursor:
+            raise InvalidCursor("Cursor pagination is not available for relevance sort")
+        return snapshot.render(snapshot.ranked(hits, mask, limit, skip)), None
+
+    if sort_by not in ("name", "price", "-price"):
+        sort_by = "name"
+    rows, next_cursor = snapshot.page(mask, sort_by, cursor, limit, skip)
+    return snapshot.render(rows), next_cursor
+
+
+async def product_facets(
+    db: AsyncSession,
+    search: Optional[str],
+    category: Optional[str],
+    badge: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+) -> dict:
+    """Facet counts for the current filter, computed over the snapshot arrays"""
+    snapshot = await catalog.get(db)
+    hits = await search_hits(db, search) if search else None
+    return snapshot.facets(snapshot.mask(hits, category, badge, min_price, max_price))
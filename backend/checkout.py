@@ -0,0 +1,106 @@
+"""
+Stock reservation and server-side pricing for checkout
+
+All products of an order are reserved with one conditional
+
+    UPDATE products SET stock = stock - qty WHERE id IN (...) AND stock >= qty
+    RETURNING id, name, image, price
+
+inside the order's transaction, so concurrent checkouts cannot oversell and
+the order is priced from the same rows it reserved. If any product is
+missing or short, the caller rolls back and nothing is reserved.
+
+Cancelling an order gives its quantities back with release_stock(); moving
+it out of `cancelled` reserves them again with reserve_stock(). Both only
+apply to orders with `stock_reserved` set (orders placed before this never
+took stock).
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Product
+
+# Rows created before stock was tracked have NULL stock (shown as 100 in the API)
+DEFAULT_STOCK = 100
+
+
+class ProductNotFound(LookupError):
+    """An ordered product does not exist"""
+
+
+class InsufficientStock(ValueError):
+    """An ordered product does not have enough stock left"""
+
+
+def merge_quantities(items: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    """Total quantity per product, in first-seen order"""
+    quantities: Dict[str, int] = {}
+    for product_id, quantity in items:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+async def reserve_stock(db: AsyncSession, items: Iterable[Tuple[str, int]]) -> List[dict]:
+    """Decrement stock for (product_id, quantity) pairs in one statement.
+
+    Returns order lines priced from the current product rows. Raises
+    ProductNotFound / InsufficientStock without committing; the caller must
+    roll back, as other products in the statement may already be reserved.
+    """
+    quantities = merge_quantities(items)
+    if not quantities:
+        return []
+
+    quantity = case(quantities, value=Product.id)
+    stock = func.coalesce(Product.stock, DEFAULT_STOCK)
+    result = await db.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)), stock >= quantity)
+        .values(stock=stock - quantity)
+        .returning(Product.id, Product.name, Product.image, Product.price)
+        .execution_options(synchronize_session=False)
+    )
+    reserved = {row.id: row for row in result}
+
+    missing = [product_id for product_id in quantities if product_id not in reserved]
+    if missing:
+        existing = set((await db.execute(
+            select(Product.id).where(Product.id.in_(missing))
+        )).scalars())
+        unknown = [product_id for product_id in missing if product_id not in existing]
+        if unknown:
+            raise ProductNotFound(f"Product not found: {', '.join(unknown)}")
+        raise InsufficientStock(f"Insufficient stock: {', '.join(missing)}")
+
+    return [
+        {
+            "productId": product_id,
+            "productName": reserved[product_id].name,
+            "productImage": reserved[product_id].image,
+            "price": float(reserved[product_id].price),
+            "quantity": qty,
+        }
+        for product_id, qty in quantities.items()
+    ]
+
+
+async def release_stock(db: AsyncSession, items: Iterable[Tuple[str, int]]) -> None:
+    """Return (product_id, quantity) pairs to stock; deleted products are skipped"""
+    quantities = merge_quantities(items)
+    if not quantities:
+        return
+
+    quantity = case(quantities, value=Product.id)
+    stock = func.coalesce(Product.stock, DEFAULT_STOCK)
+    await db.execute(
+        update(Product)
+        .where(Product.id.in_(list(quantities)))
+        .values(stock=stock + quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def order_total(lines: List[dict]) -> float:
+    return round(sum(line["price"] * line["quantity"] for line in lines), 2)
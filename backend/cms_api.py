@@ -4,11 +4,13 @@ CMS API endpoints for admin panel
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
-from database import get_db, PageContent, HeroSection, FooterLink
+from database import read_db, get_write_db, PageContent, HeroSection, FooterLink
+from serialization import ORJSONResponse
+from response_cache import cached, invalidates
 from pydantic import BaseModel
 from typing import List, Optional
 
-cms_router = APIRouter(prefix="/api/cms", tags=["CMS"])
+cms_router = APIRouter(prefix="/api/cms", tags=["CMS"], default_response_class=ORJSONResponse)
 
 
 # Pydantic models
@@ -49,11 +51,12 @@ class FooterLinkUpdate(BaseModel):
 # ============ PAGE CONTENT ENDPOINTS ============
 
 @cms_router.get("/pages", response_model=List[dict])
-async def get_all_pages(db: AsyncSession = Depends(get_db)):
+@cached("cms_pages")
+async def get_all_pages(db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get all pages"""
     result = await db.execute(select(PageContent))
     pages = result.scalars().all()
-    return [
+    return ORJSONResponse([
         {
             "id": p.id,
             "page_key": p.page_key,
@@ -64,10 +67,11 @@ async def get_all_pages(db: AsyncSession = Depends(get_db)):
             "updated_at": p.updated_at
         }
         for p in pages
-    ]
+    ])
 
 @cms_router.get("/pages/{page_key}")
-async def get_page_by_key(page_key: str, db: AsyncSession = Depends(get_db)):
+@cached("cms_pages")
+async def get_page_by_key(page_key: str, db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get page by key"""
     result = await db.execute(
         select(PageContent).where(PageContent.page_key == page_key)
@@ -77,7 +81,7 @@ async def get_page_by_key(page_key: str, db: AsyncSession = Depends(get_db)):
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
     
-    return {
+    return ORJSONResponse({
         "id": page.id,
         "page_key": page.page_key,
         "title": page.title,
@@ -85,13 +89,14 @@ async def get_page_by_key(page_key: str, db: AsyncSession = Depends(get_db)):
         "meta_description": page.meta_description,
         "meta_keywords": page.meta_keywords,
         "updated_at": page.updated_at
-    }
+    })
 
 @cms_router.put("/pages/{page_key}")
+@invalidates("cms_pages")
 async def update_page(
     page_key: str, 
     page_data: PageContentUpdate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update page content"""
     result = await db.execute(
@@ -117,7 +122,8 @@ async def update_page(
 # ============ HERO SECTION ENDPOINTS ============
 
 @cms_router.get("/hero")
-async def get_hero_section(db: AsyncSession = Depends(get_db)):
+@cached("cms_hero")
+async def get_hero_section(db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get hero section"""
     result = await db.execute(select(HeroSection))
     hero = result.scalar_one_or_none()
@@ -125,7 +131,7 @@ async def get_hero_section(db: AsyncSession = Depends(get_db)):
     if not hero:
         raise HTTPException(status_code=404, detail="Hero section not found")
     
-    return {
+    return ORJSONResponse({
         "id": hero.id,
         "title": hero.title,
         "subtitle": hero.subtitle,
@@ -133,12 +139,13 @@ async def get_hero_section(db: AsyncSession = Depends(get_db)):
         "button_link": hero.button_link,
         "background_image": hero.background_image,
         "updated_at": hero.updated_at
-    }
+    })
 
 @cms_router.put("/hero")
+@invalidates("cms_hero")
 async def update_hero_section(
     hero_data: HeroSectionSchema,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update hero section"""
     result = await db.execute(select(HeroSection))
@@ -162,13 +169,14 @@ async def update_hero_section(
 # ============ FOOTER LINKS ENDPOINTS ============
 
 @cms_router.get("/footer-links", response_model=List[dict])
-async def get_footer_links(db: AsyncSession = Depends(get_db)):
+@cached("footer_links")
+async def get_footer_links(db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get all footer links"""
     result = await db.execute(
         select(FooterLink).order_by(FooterLink.section, FooterLink.order)
     )
     links = result.scalars().all()
-    return [
+    return ORJSONResponse([
         {
             "id": link.id,
             "section": link.section,
@@ -178,12 +186,13 @@ async def get_footer_links(db: AsyncSession = Depends(get_db)):
             "is_active": link.is_active
         }
         for link in links
-    ]
+    ])
 
 @cms_router.post("/footer-links")
+@invalidates("footer_links")
 async def create_footer_link(
     link_data: FooterLinkSchema,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Create new footer link"""
     link = FooterLink(**link_data.dict())
@@ -192,10 +201,11 @@ async def create_footer_link(
     return {"message": "Footer link created successfully", "id": link.id}
 
 @cms_router.put("/footer-links/{link_id}")
+@invalidates("footer_links")
 async def update_footer_link(
     link_id: str,
     link_data: FooterLinkUpdate,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update footer link"""
     update_data = link_data.dict(exclude_unset=True)
@@ -210,9 +220,10 @@ async def update_footer_link(
     return {"message": "Footer link updated successfully"}
 
 @cms_router.delete("/footer-links/{link_id}")
+@invalidates("footer_links")
 async def delete_footer_link(
     link_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Delete footer link"""
     await db.execute(
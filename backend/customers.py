@@ -0,0 +1,135 @@
+"""
+Customer identity and running totals
+
+Orders and quick orders reference a `customers` row keyed by the buyer's
+normalised phone. The row keeps order_count, total_spent and last_order_at
+up to date as orders are placed and (un)cancelled, so top-customers is an
+ORDER BY over an index instead of a GROUP BY over all orders.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import bindparam, func, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Customer, Order, QuickOrder, insert_for
+
+# Orders in this status do not count towards a customer's totals
+EXCLUDED_STATUS = "cancelled"
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Canonical +380XXXXXXXXX form of a Ukrainian phone (other numbers: +digits)"""
+    digits = re.sub(r"\D", "", phone or "")
+    if not digits:
+        return None
+    if len(digits) == 10 and digits.startswith("0"):
+        digits = "38" + digits
+    elif len(digits) == 11 and digits.startswith("80"):
+        digits = "3" + digits
+    return "+" + digits
+
+
+async def _add(db: AsyncSession, phone: str, name: str, orders: int, spent: float, placed_at=None) -> None:
+    insert = insert_for(db.get_bind().dialect.name)
+    stmt = insert(Customer).values(
+        phone=phone, name=name, order_count=orders, total_spent=spent, last_order_at=placed_at
+    )
+    changes = {
+        "order_count": Customer.order_count + stmt.excluded.order_count,
+        "total_spent": Customer.total_spent + stmt.excluded.total_spent,
+    }
+    if placed_at is not None:
+        changes.update(name=stmt.excluded.name, last_order_at=stmt.excluded.last_order_at)
+    await db.execute(stmt.on_conflict_do_update(index_elements=[Customer.phone], set_=changes))
+
+
+async def record_customer_order(db: AsyncSession, phone: str, name: str, amount: float, placed_at) -> Optional[str]:
+    """Count a new order for its customer; returns the customer id for the order's FK"""
+    customer_id = normalize_phone(phone)
+    if customer_id is None:
+        return None
+    await _add(db, customer_id, name, 1, amount, placed_at)
+    return customer_id
+
+
+async def record_customer_status_change(db: AsyncSession, order: Order, old_status: str) -> None:
+    """Remove a cancelled order from its customer's totals (or restore an uncancelled one)"""
+    if order.customer_id is None:
+        return
+    was_counted = old_status != EXCLUDED_STATUS
+    is_counted = order.status != EXCLUDED_STATUS
+    if was_counted == is_counted:
+        return
+    sign = 1 if is_counted else -1
+    await _add(db, order.customer_id, order.customer_name, sign, sign * order.total_amount)
+
+
+# ============ MIGRATION ============
+
+def backfill_customers(connection) -> None:
+    """Link orders without a customer and recompute customer totals (sync, for init_db)"""
+    unlinked = {}
+    for model in (Order, QuickOrder):
+        rows = connection.execute(
+            select(model.id, model.customer_phone, model.customer_name, model.created_at)
+            .where(model.customer_id.is_(None))
+            .order_by(model.created_at)
+        ).all()
+        links = []
+        for order_id, phone, name, created_at in rows:
+            customer_id = normalize_phone(phone)
+            if customer_id is None:
+                continue
+            links.append({"order_id": order_id, "linked_customer": customer_id})
+            unlinked[customer_id] = name
+        if links:
+            connection.execute(
+                update(model.__table__)
+                .where(model.__table__.c.id == bindparam("order_id"))
+                .values(customer_id=bindparam("linked_customer")),
+                links,
+            )
+
+    if not unlinked:
+        return
+
+    insert = insert_for(connection.dialect.name)
+    connection.execute(
+        insert(Customer).on_conflict_do_nothing(index_elements=[Customer.phone]),
+        [{"phone": phone, "name": name, "order_count": 0, "total_spent": 0.0}
+         for phone, name in unlinked.items()],
+    )
+
+    purchases = union_all(
+        select(Order.customer_id, Order.total_amount.label("amount"), Order.created_at)
+        .where(Order.status != EXCLUDED_STATUS, Order.customer_id.isnot(None)),
+        select(QuickOrder.customer_id, (QuickOrder.price * QuickOrder.quantity).label("amount"), QuickOrder.created_at)
+        .where(QuickOrder.status != EXCLUDED_STATUS, QuickOrder.customer_id.isnot(None)),
+    ).subquery()
+    totals = connection.execute(
+        select(
+            purchases.c.customer_id,
+            func.count().label("order_count"),
+            func.sum(purchases.c.amount).label("total_spent"),
+            func.max(purchases.c.created_at).label("last_order_at"),
+        ).group_by(purchases.c.customer_id)
+    ).all()
+
+    customers = Customer.__table__
+    connection.execute(customers.update().values(order_count=0, total_spent=0.0))
+    if totals:
+        connection.execute(
+            customers.update()
+            .where(customers.c.phone == bindparam("customer_id"))
+            .values(
+                order_count=bindparam("count"),
+                total_spent=bindparam("spent"),
+                last_order_at=bindparam("last_at"),
+            ),
+            [
+                {"customer_id": row.customer_id, "count": row.order_count,
+                 "spent": row.total_spent, "last_at": row.last_order_at}
+                for row in totals
+            ],
+        )
@@ -1,22 +1,43 @@
 from sqlalchemy import (
-    create_engine,
     Column,
     String,
     Float,
     Integer,
+    Date,
     DateTime,
     Text,
     Boolean,
     ForeignKey,
+    Index,
     JSON,
+    LargeBinary,
+    event,
+    func,
+    inspect,
+    select,
 )
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
 from pathlib import Path
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Optional
+import asyncio
+import json
+import logging
+import time
 import uuid
 import os
 
+from search_analysis import to_search_text
+from search_index import setup_search_index
+
 # =========================
 # ENV
 # =========================
@@ -35,22 +56,250 @@ DATABASE_URL = os.environ.get(
     f"sqlite:///{ROOT_DIR / 'platansad.db'}"
 )
 
+
+def _async_url(url: str) -> str:
+    """Pick the async driver: aiosqlite for SQLite, asyncpg for PostgreSQL"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url[len("postgres://"):]
+    if url.startswith("postgresql:") or url.startswith("postgresql+psycopg2:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+DATABASE_URL = _async_url(DATABASE_URL)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
 # =========================
-# ENGINE (SYNC)
+# ENGINE (ASYNC)
 # =========================
-
-engine = create_engine(
+# Розмір пулу: DB_POOL_SIZE постійних з'єднань + DB_MAX_OVERFLOW тимчасових.
+# Один воркер uvicorn обслуговує паралельні запити, поки інші чекають на БД.
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+
+def _engine_options(url: str) -> dict:
+    """Pool settings for the given async URL"""
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url.rstrip("/").endswith("sqlite+aiosqlite:"):
+            # One shared connection, otherwise each connection gets its own empty DB
+            return {"poolclass": StaticPool}
+        # aiosqlite runs each connection in its own thread; a small pool is enough
+        return {
+            "pool_size": min(DB_POOL_SIZE, 5),
+            "max_overflow": min(DB_MAX_OVERFLOW, 10),
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    connect_args={"check_same_thread": False}
-    if DATABASE_URL.startswith("sqlite")
-    else {},
+    **_engine_options(DATABASE_URL),
 )
 
-SessionLocal = sessionmaker(
-    autocommit=False,
+AsyncSessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
     autoflush=False,
-    bind=engine,
+    expire_on_commit=False,
+)
+
+# =========================
+# READ REPLICA (OPTIONAL)
+# =========================
+# DATABASE_READ_URL — репліка для публічних GET. Якщо не задано, все йде на основну БД.
+
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL")
+DATABASE_READ_MAX_LAG = float(os.environ.get("DATABASE_READ_MAX_LAG", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get("REPLICA_LAG_CHECK_INTERVAL", "2"))
+# Connecting and querying together; a slower replica counts as unreachable
+REPLICA_LAG_PROBE_TIMEOUT = float(os.environ.get("REPLICA_LAG_PROBE_TIMEOUT", "1"))
+
+read_engine = None
+AsyncReadSessionLocal = None
+
+if DATABASE_READ_URL:
+    DATABASE_READ_URL = _async_url(DATABASE_READ_URL)
+    read_engine = create_async_engine(
+        DATABASE_READ_URL,
+        echo=False,
+        **_engine_options(DATABASE_READ_URL),
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        read_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+logger = logging.getLogger(__name__)
+_replica_lag: Optional[float] = None
+_replica_lag_checked_at = 0.0
+_replica_probe: Optional[asyncio.Task] = None
+
+
+async def _probe_replica_lag() -> None:
+    """Measure the replica's replay lag; None if it cannot be reached in time"""
+    global _replica_lag
+
+    if read_engine.dialect.name != "postgresql":
+        _replica_lag = 0.0
+        return
+
+    async def query_lag() -> float:
+        async with read_engine.connect() as conn:
+            # NULL on a server that is not replaying WAL (i.e. not a standby)
+            return (await conn.exec_driver_sql(
+                "SELECT CASE WHEN pg_is_in_recovery() THEN "
+                "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            )).scalar()
+
+    try:
+        _replica_lag = float(await asyncio.wait_for(query_lag(), REPLICA_LAG_PROBE_TIMEOUT))
+    except (SQLAlchemyError, OSError, asyncio.TimeoutError) as e:
+        logger.warning(f"Read replica unavailable, using primary: {e!r}")
+        _replica_lag = None
+
+
+async def replica_lag() -> Optional[float]:
+    """Last measured replica lag in seconds (None = unknown/unreachable).
+
+    Re-measured every few seconds by a background probe, so requests never
+    wait on an unreachable replica: they use the primary until a probe
+    succeeds.
+    """
+    global _replica_lag_checked_at, _replica_probe
+
+    now = time.monotonic()
+    probing = _replica_probe is not None and not _replica_probe.done()
+    if not probing and now - _replica_lag_checked_at >= REPLICA_LAG_CHECK_INTERVAL:
+        _replica_lag_checked_at = now
+        _replica_probe = asyncio.create_task(_probe_replica_lag())
+    return _replica_lag
+
+
+# =========================
+# SQLITE PROFILE
+# =========================
+# WAL: читачі не блокуються записом; busy_timeout: чекати замість "database is locked"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.environ.get("SQLITE_CACHE_KB", "65536")),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+if IS_SQLITE:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+# SQLite allows one writer at a time; writes in this process queue on this lock
+# (in order of arrival) instead of racing each other into SQLITE_BUSY.
+_write_lock = asyncio.Lock()
+
+
+def _takes_write_lock(statement) -> bool:
+    """INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE and raw SQL"""
+    return (
+        getattr(statement, "is_dml", False)
+        or getattr(statement, "_for_update_arg", None) is not None
+        or isinstance(statement, TextClause)
+    )
+
+
+class SQLiteWriteSession(AsyncSession):
+    """Session that holds _write_lock from its first write until the
+    transaction ends (commit, rollback or close).
+
+    The SQLite driver only opens a transaction at the first write
+    statement, so reads before it, and work after the commit (cache
+    refreshes, serialization, uploads), do not block other writers. Read
+    rows that a write depends on with SELECT ... FOR UPDATE, which takes
+    the lock here and a row lock on PostgreSQL.
+    """
+
+    _holds_write_lock = False
+
+    async def _lock_for_write(self) -> None:
+        if not self._holds_write_lock:
+            await _write_lock.acquire()
+            self._holds_write_lock = True
+
+    def _release_write_lock(self) -> None:
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            _write_lock.release()
+
+    def _has_pending_changes(self) -> bool:
+        return bool(self.new or self.dirty or self.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if _takes_write_lock(statement):
+            await self._lock_for_write()
+        return await super().execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        if _takes_write_lock(statement):
+            await self._lock_for_write()
+        return await super().scalar(statement, *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        if _takes_write_lock(statement):
+            await self._lock_for_write()
+        return await super().stream(statement, *args, **kwargs)
+
+    async def flush(self, objects=None) -> None:
+        if self._has_pending_changes():
+            await self._lock_for_write()
+        await super().flush(objects)
+
+    async def commit(self) -> None:
+        if self._has_pending_changes():
+            await self._lock_for_write()
+        try:
+            await super().commit()
+        finally:
+            self._release_write_lock()
+
+    async def rollback(self) -> None:
+        try:
+            await super().rollback()
+        finally:
+            self._release_write_lock()
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            self._release_write_lock()
+
+
+AsyncWriteSessionLocal = async_sessionmaker(
+    engine,
+    class_=SQLiteWriteSession if IS_SQLITE else AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
 Base = declarative_base()
@@ -74,6 +323,25 @@ class Product(Base):
     description = Column(Text, nullable=False)
     stock = Column(Integer, default=100)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Row version for cached JSON (see serialization.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Precomputed search terms (see search_analysis.py), indexed by search_index.py
+    search_name = Column(Text, nullable=True)
+    search_description = Column(Text, nullable=True)
+
+    # Keyset pagination indexes, one per sort order (see pagination.py)
+    __table_args__ = (
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+    )
+
+
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _fill_search_columns(mapper, connection, target):
+    target.search_name = to_search_text(target.name, target.article)
+    target.search_description = to_search_text(target.description)
 
 
 class Category(Base):
@@ -95,6 +363,13 @@ class CartItem(Base):
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=1)
     user_id = Column(String, default="guest", index=True)
+    # Last add/change; guest carts idle longer than GUEST_TTL_DAYS are purged (see guests.py)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # ON CONFLICT target of the cart upsert (see cart.py)
+        Index("uq_cart_user_id_product_id", "user_id", "product_id", unique=True),
+    )
 
 
 class WishlistItem(Base):
@@ -105,6 +380,28 @@ class WishlistItem(Base):
     user_id = Column(String, default="guest", index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # ON CONFLICT target of the wishlist insert-or-ignore (see wishlist.py)
+        Index("uq_wishlist_user_id_product_id", "user_id", "product_id", unique=True),
+    )
+
+
+class Customer(Base):
+    """One row per buyer, keyed by normalised phone (see customers.py)"""
+    __tablename__ = "customers"
+
+    phone = Column(String, primary_key=True)  # +380XXXXXXXXX
+    name = Column(String, nullable=False)
+    # Running totals over non-cancelled orders and quick orders
+    order_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0.0)
+    last_order_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_customers_order_count_total_spent", "order_count", "total_spent"),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -119,9 +416,29 @@ class Order(Base):
     delivery_address = Column(Text, nullable=False)
     delivery_method = Column(String, nullable=False)
     payment_method = Column(String, nullable=False)
-    status = Column(String, default="pending")
+    status = Column(String, default="pending", index=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    customer_id = Column(String, ForeignKey("customers.phone"), nullable=True, index=True)
+    # Set when checkout took the order's stock (see checkout.py); NULL/False for
+    # orders placed before stock was reserved, which must not give stock back
+    stock_reserved = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
+
+
+class OrderItem(Base):
+    """Order line items, normalised from Order.items for sales analytics"""
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(String, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(String, nullable=False, index=True)
+    product_name = Column(String, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
 
 
 class QuickOrder(Base):
@@ -138,6 +455,39 @@ class QuickOrder(Base):
     status = Column(String, default="pending")
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    customer_id = Column(String, ForeignKey("customers.phone"), nullable=True)
+    # See Order.stock_reserved
+    stock_reserved = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("ix_quick_orders_customer_id_created_at", "customer_id", "created_at"),
+    )
+
+
+class DailySales(Base):
+    """Per-day, per-status order totals (maintained by sales_rollup.py)"""
+    __tablename__ = "daily_sales"
+
+    date = Column(Date, primary_key=True)  # local date in the shop timezone
+    status = Column(String, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+    item_count = Column(Integer, nullable=False, default=0)
+    quick_order_count = Column(Integer, nullable=False, default=0)
+    quick_revenue = Column(Float, nullable=False, default=0.0)
+    quick_item_count = Column(Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(Base):
+    """Stored responses of order-creating requests (see idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String, primary_key=True)  # endpoint, e.g. "orders"
+    key = Column(String, primary_key=True)  # client's Idempotency-Key header
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
 
 class SiteSettings(Base):
@@ -238,17 +588,204 @@ class MediaFile(Base):
 # DB HELPERS
 # =========================
 
-def get_db():
-    db = SessionLocal()
-    try:
+def insert_for(dialect_name: str):
+    """Dialect insert() supporting ON CONFLICT (PostgreSQL / SQLite)"""
+    return pg_insert if dialect_name == "postgresql" else sqlite_insert
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def read_db(max_lag: Optional[float] = None):
+    """Dependency factory for read-only routes.
+
+    Uses the replica while its lag is within `max_lag` seconds
+    (DATABASE_READ_MAX_LAG by default), otherwise the primary.
+    """
+    tolerance = DATABASE_READ_MAX_LAG if max_lag is None else max_lag
+
+    async def get_read_session():
+        session_factory = AsyncSessionLocal
+        if read_engine is not None:
+            lag = await replica_lag()
+            if lag is not None and lag <= tolerance:
+                session_factory = AsyncReadSessionLocal
+        async with session_factory() as db:
+            yield db
+
+    return get_read_session
+
+
+get_read_db = read_db()
+
+
+@asynccontextmanager
+async def write_session():
+    """Session for writes; on SQLite only one transaction writes at a time
+    (see SQLiteWriteSession)"""
+    async with AsyncWriteSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def write_lock():
+    """Hold the SQLite write lock for writes on a raw connection (no-op on PostgreSQL)"""
+    if not IS_SQLITE:
+        yield
+        return
+
+    async with _write_lock:
+        yield
 
 
-def close_db():
-    engine.dispose()
+async def get_write_db():
+    """Dependency for handlers that write (see write_session)"""
+    async with write_session() as db:
+        yield db
+
+
+def _add_missing_columns(connection):
+    """ALTER existing tables to add model columns that create_all() skips"""
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            col_type = col.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(col.name)} {col_type}"
+            )
+
+
+def _order_item_row(order_id: str, item) -> Optional[dict]:
+    """order_items row for one legacy Order.items entry (None if unusable)"""
+    if not isinstance(item, dict):
+        return None
+    try:
+        quantity = int(item.get("quantity") or 1)
+        unit_price = float(item.get("price") or 0)
+    except (TypeError, ValueError):
+        return None
+    return {
+        "order_id": order_id,
+        "product_id": item.get("productId") or "",
+        "product_name": item.get("productName") or "",
+        "quantity": quantity,
+        "unit_price": unit_price,
+    }
+
+
+def _backfill_order_items(connection):
+    """Fill order_items from the Order.items JSON of orders that have no rows yet"""
+    has_no_items = ~select(OrderItem.id).where(OrderItem.order_id == Order.id).exists()
+    # Cheap check first, so startups after the backfill skip loading and parsing orders
+    if connection.execute(select(Order.id).where(has_no_items).limit(1)).first() is None:
+        return
+
+    missing = connection.execute(select(Order.id, Order.items).where(has_no_items)).all()
+
+    rows = []
+    skipped = 0
+    for order_id, items in missing:
+        try:
+            items = json.loads(items) if isinstance(items, str) else items
+        except ValueError:
+            items = None
+        for item in items if isinstance(items, list) else []:
+            row = _order_item_row(order_id, item)
+            if row is None:
+                skipped += 1
+            else:
+                rows.append(row)
+    if skipped:
+        logger.warning(f"order_items backfill: skipped {skipped} malformed order line(s)")
+
+    for start in range(0, len(rows), 500):
+        connection.execute(OrderItem.__table__.insert(), rows[start:start + 500])
+
+
+def _stamp_cart_updated_at(connection):
+    """Start the guest TTL of cart rows created before updated_at existed"""
+    cart = CartItem.__table__
+    connection.execute(
+        cart.update().where(cart.c.updated_at.is_(None)).values(updated_at=datetime.utcnow())
+    )
+
+
+def _merge_duplicate_cart_items(connection):
+    """Fold duplicate (user_id, product_id) cart rows into one, so the
+    unique index can be created on an existing table"""
+    cart = CartItem.__table__
+    duplicates = connection.execute(
+        select(
+            cart.c.user_id,
+            cart.c.product_id,
+            func.min(cart.c.id).label("keep"),
+            func.sum(cart.c.quantity).label("quantity"),
+        )
+        .group_by(cart.c.user_id, cart.c.product_id)
+        .having(func.count() > 1)
+    ).all()
+    for row in duplicates:
+        connection.execute(cart.update().where(cart.c.id == row.keep).values(quantity=row.quantity))
+        connection.execute(
+            cart.delete().where(
+                cart.c.user_id == row.user_id,
+                cart.c.product_id == row.product_id,
+                cart.c.id != row.keep,
+            )
+        )
+
+
+def _remove_duplicate_wishlist_items(connection):
+    """Keep one row per (user_id, product_id) wishlist entry, so the unique
+    index can be created on an existing table"""
+    wishlist = WishlistItem.__table__
+    duplicates = connection.execute(
+        select(wishlist.c.user_id, wishlist.c.product_id, func.min(wishlist.c.id).label("keep"))
+        .group_by(wishlist.c.user_id, wishlist.c.product_id)
+        .having(func.count() > 1)
+    ).all()
+    for row in duplicates:
+        connection.execute(
+            wishlist.delete().where(
+                wishlist.c.user_id == row.user_id,
+                wishlist.c.product_id == row.product_id,
+                wishlist.c.id != row.keep,
+            )
+        )
+
+
+def _create_missing_indexes(connection):
+    """Create model indexes that were added after their table existed"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_stamp_cart_updated_at)
+        await conn.run_sync(_merge_duplicate_cart_items)
+        await conn.run_sync(_remove_duplicate_wishlist_items)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(_backfill_order_items)
+        # customers.py imports the models from this module
+        from customers import backfill_customers
+        await conn.run_sync(backfill_customers)
+        await conn.run_sync(setup_search_index)
+
+
+async def close_db():
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
@@ -0,0 +1,98 @@
+"""
+Faceted counts for the product catalog
+
+All facets (categories, badges, price histogram) for the current filter
+come from one GROUP BY round trip over (category, badges, price bucket);
+the handful of grouped rows is then folded in Python.
+"""
+import json
+from collections import Counter
+from typing import List
+
+from sqlalchemy import String, case, cast, func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from database import Product
+
+# Lower bounds of the price histogram buckets (UAH); the last bucket is open-ended
+PRICE_BUCKETS = [0, 250, 500, 1000, 2500, 5000, 10000]
+
+
+def _price_bucket_expr():
+    """SQL expression returning the PRICE_BUCKETS index of Product.price.
+
+    Bounds are inlined rather than bound so the SELECT and GROUP BY
+    expressions are textually identical (PostgreSQL requires that).
+    """
+    return case(
+        *[
+            (Product.price >= literal_column(str(lower)), literal_column(str(i)))
+            for i, lower in reversed(list(enumerate(PRICE_BUCKETS)))
+        ],
+        else_=literal_column("0"),
+    )
+
+
+def build_facets(total: int, categories: Counter, badges: Counter, buckets: Counter,
+                 min_price, max_price) -> dict:
+    """Shape facet counters into the API response"""
+    price_buckets = []
+    for i, lower in enumerate(PRICE_BUCKETS):
+        upper = PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None
+        price_buckets.append({"min": lower, "max": upper, "count": buckets.get(i, 0)})
+
+    return {
+        "total": total,
+        "categories": [
+            {"value": name, "count": count}
+            for name, count in sorted(categories.items(), key=lambda kv: (-kv[1], kv[0]))
+        ],
+        "badges": [
+            {"value": name, "count": count}
+            for name, count in sorted(badges.items(), key=lambda kv: (-kv[1], kv[0]))
+        ],
+        "priceBuckets": price_buckets,
+        "minPrice": min_price,
+        "maxPrice": max_price,
+    }
+
+
+async def compute_facets(db: AsyncSession, filtered: Select) -> dict:
+    """Facet counts for an (unordered, unpaginated) filtered products query"""
+    bucket = _price_bucket_expr().label("bucket")
+    badges_text = cast(Product.badges, String).label("badges")
+    grouped = (
+        filtered.with_only_columns(
+            Product.category,
+            badges_text,
+            bucket,
+            func.count().label("count"),
+            func.min(Product.price).label("min_price"),
+            func.max(Product.price).label("max_price"),
+        )
+        .group_by(Product.category, badges_text, bucket)
+    )
+    rows = (await db.execute(grouped)).all()
+
+    total = 0
+    categories: Counter = Counter()
+    badges: Counter = Counter()
+    buckets: Counter = Counter()
+    min_prices: List[float] = []
+    max_prices: List[float] = []
+
+    for row in rows:
+        total += row.count
+        categories[row.category] += row.count
+        buckets[row.bucket] += row.count
+        for badge in set(json.loads(row.badges) if row.badges else []):
+            badges[badge] += row.count
+        min_prices.append(row.min_price)
+        max_prices.append(row.max_price)
+
+    return build_facets(
+        total, categories, badges, buckets,
+        min(min_prices) if min_prices else None,
+        max(max_prices) if max_prices else None,
+    )
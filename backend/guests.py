@@ -0,0 +1,144 @@
+"""
+Guest carts and wishlists
+
+Anonymous visitors use an opaque per-visitor id (`guest-<uuid>`, created by
+the frontend and kept in localStorage) instead of all sharing the literal
+"guest" bucket. When a visitor signs in, merge_guest() folds the guest's
+cart and wishlist into the user id with one INSERT ... SELECT ... ON
+CONFLICT per table. Guest rows idle for GUEST_TTL_DAYS are deleted by
+purge_expired_guests() in small batches, each in its own short transaction.
+
+Run a purge by hand:
+
+    python guests.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import DateTime, and_, delete, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import CartItem, WishlistItem, init_db, insert_for, write_session
+
+GUEST_PREFIX = "guest-"
+# Rows of the shared bucket used before per-visitor ids
+LEGACY_GUEST_ID = "guest"
+GUEST_TTL_DAYS = float(os.environ.get("GUEST_TTL_DAYS", "30"))
+PURGE_BATCH_SIZE = int(os.environ.get("GUEST_PURGE_BATCH_SIZE", "500"))
+
+
+def is_guest_id(user_id: str) -> bool:
+    return user_id == LEGACY_GUEST_ID or user_id.startswith(GUEST_PREFIX)
+
+
+def _is_guest(column):
+    """Guest ids as an index-friendly range ("guest-" <= id < "guest.")"""
+    next_prefix = GUEST_PREFIX[:-1] + chr(ord(GUEST_PREFIX[-1]) + 1)
+    return or_(column == LEGACY_GUEST_ID, and_(column >= GUEST_PREFIX, column < next_prefix))
+
+
+# ============ MERGE ============
+
+async def merge_guest(db: AsyncSession, guest_id: str, user_id: str) -> Dict[str, int]:
+    """Fold a guest's cart and wishlist into user_id (caller commits).
+
+    Cart quantities of products in both carts are added up; wishlist
+    entries already present are kept. Returns the number of guest rows
+    merged per table.
+    """
+    insert = insert_for(db.get_bind().dialect.name)
+    now = literal(datetime.utcnow(), DateTime)
+    # Merged rows need new primary keys while the guest rows still exist
+    id_suffix = "-" + uuid.uuid4().hex[:8]
+
+    cart = CartItem.__table__
+    stmt = insert(cart).from_select(
+        ["id", "product_id", "product_name", "product_image", "price", "quantity", "user_id", "updated_at"],
+        select(
+            cart.c.id + id_suffix,
+            cart.c.product_id,
+            cart.c.product_name,
+            cart.c.product_image,
+            cart.c.price,
+            cart.c.quantity,
+            literal(user_id),
+            now,
+        ).where(cart.c.user_id == guest_id),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[cart.c.user_id, cart.c.product_id],
+        set_={"quantity": cart.c.quantity + stmt.excluded.quantity, "updated_at": stmt.excluded.updated_at},
+    ))
+
+    wishlist = WishlistItem.__table__
+    await db.execute(
+        insert(wishlist)
+        .from_select(
+            ["id", "product_id", "user_id", "created_at"],
+            select(
+                wishlist.c.id + id_suffix,
+                wishlist.c.product_id,
+                literal(user_id),
+                wishlist.c.created_at,
+            ).where(wishlist.c.user_id == guest_id),
+        )
+        .on_conflict_do_nothing(index_elements=[wishlist.c.user_id, wishlist.c.product_id])
+    )
+
+    merged_cart = await db.execute(delete(cart).where(cart.c.user_id == guest_id))
+    merged_wishlist = await db.execute(delete(wishlist).where(wishlist.c.user_id == guest_id))
+    return {"cart": merged_cart.rowcount or 0, "wishlist": merged_wishlist.rowcount or 0}
+
+
+# ============ TTL PURGE ============
+
+async def _purge_table(table, idle_since, cutoff: datetime, batch_size: int) -> int:
+    """Delete expired guest rows in keyset-ordered batches of batch_size"""
+    deleted = 0
+    last_id = ""
+    while True:
+        async with write_session() as db:
+            ids = (await db.execute(
+                select(table.c.id)
+                .where(_is_guest(table.c.user_id), idle_since < cutoff, table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                return deleted
+            result = await db.execute(delete(table).where(table.c.id.in_(ids)))
+            await db.commit()
+        deleted += result.rowcount or 0
+        last_id = ids[-1]
+
+
+async def purge_expired_guests(
+    ttl_days: float = GUEST_TTL_DAYS, batch_size: int = PURGE_BATCH_SIZE
+) -> Dict[str, int]:
+    """Delete guest cart/wishlist rows idle for ttl_days; returns rows deleted per table.
+
+    Each batch is a separate short write transaction, so checkout is never
+    blocked for longer than one batch.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=ttl_days)
+    cart = CartItem.__table__
+    wishlist = WishlistItem.__table__
+    return {
+        "cart": await _purge_table(cart, cart.c.updated_at, cutoff, batch_size),
+        "wishlist": await _purge_table(wishlist, wishlist.c.created_at, cutoff, batch_size),
+    }
+
+
+async def main():
+    """Purge expired guest carts and wishlists"""
+    print(f"🧹 Purging guest carts and wishlists idle for {GUEST_TTL_DAYS:g} days...")
+    await init_db()
+    deleted = await purge_expired_guests()
+    print(f"✅ Deleted {deleted['cart']} cart rows, {deleted['wishlist']} wishlist rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
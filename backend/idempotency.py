@@ -0,0 +1,111 @@
+"""
+Idempotency keys for order-creating endpoints
+
+A client may send an `Idempotency-Key` header with POST /api/orders and
+POST /api/quick-order. The first request stores its response under
+(endpoint, key) in the same transaction as the order; a retry with the same
+key gets the stored response back without creating another order. Keys
+expire after IDEMPOTENCY_KEY_TTL seconds (24h by default).
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import IdempotencyKey, insert_for
+
+IDEMPOTENCY_KEY_TTL = float(os.environ.get("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))
+MAX_KEY_LENGTH = 255
+# Expired keys are deleted at most this often (seconds), by the next save()
+PURGE_INTERVAL = 60
+
+
+class InvalidIdempotencyKey(ValueError):
+    """Key is malformed or was already used for a different request"""
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    """Hash of the request body, to reject a key reused for another request"""
+    data = orjson.dumps(payload.model_dump(mode="json"), option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(data).hexdigest()
+
+
+class IdempotencyStore:
+    """Lookup and storage of responses by (scope, key)"""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_KEY_TTL):
+        self.ttl = ttl
+        self._last_purge = 0.0
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.ttl)
+
+    async def replay(self, db: AsyncSession, scope: str, key: str, fingerprint: str) -> Optional[Response]:
+        """Stored response for a key, or None if it is new (or expired)"""
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise InvalidIdempotencyKey(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        result = await db.execute(
+            select(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.created_at >= self._cutoff(),
+            )
+        )
+        stored = result.scalar_one_or_none()
+        if stored is None:
+            return None
+        if stored.request_hash != fingerprint:
+            raise InvalidIdempotencyKey("Idempotency-Key was already used for a different request")
+        return Response(
+            content=stored.response_body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    async def save(
+        self, db: AsyncSession, scope: str, key: str, fingerprint: str, body: bytes, status_code: int = 200
+    ) -> bool:
+        """Store a response in the caller's transaction (commit follows).
+
+        Returns False if a concurrent request committed the same key first;
+        the caller should then roll back and replay() instead.
+        """
+        await self.purge(db)
+
+        insert = insert_for(db.get_bind().dialect.name)
+        stmt = insert(IdempotencyKey).values(
+            scope=scope, key=key, request_hash=fingerprint,
+            status_code=status_code, response_body=body, created_at=datetime.utcnow(),
+        )
+        # An expired row with the same key is overwritten, a live one is kept
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={name: stmt.excluded[name] for name in ("request_hash", "status_code", "response_body", "created_at")},
+            where=IdempotencyKey.created_at < self._cutoff(),
+        ).returning(IdempotencyKey.key)
+        return (await db.execute(stmt)).first() is not None
+
+    async def purge(self, db: AsyncSession, force: bool = False) -> int:
+        """Delete expired keys (throttled to once per PURGE_INTERVAL unless forced)"""
+        now = time.monotonic()
+        if not force and now - self._last_purge < PURGE_INTERVAL:
+            return 0
+        self._last_purge = now
+        result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < self._cutoff()))
+        return result.rowcount or 0
+
+
+idempotency = IdempotencyStore()
+
+
+def encode_response(model: BaseModel) -> bytes:
+    return orjson.dumps(model.model_dump(mode="json"))
@@ -0,0 +1,143 @@
+"""
+Periodic in-process database maintenance
+
+A background asyncio task, started with the app (see server.py startup),
+runs every MAINTENANCE_INTERVAL seconds:
+
+- deletes expired guest carts and wishlists in small keyset batches
+  (guests.purge_expired_guests), each batch in its own write transaction
+- deletes expired idempotency keys
+- SQLite: ANALYZE; VACUUM when free pages make up VACUUM_FREE_RATIO of the
+  file, at most once per VACUUM_INTERVAL, then rebuilds the FTS index
+  (VACUUM may renumber the rowids it points at)
+- PostgreSQL: ANALYZE the tables rows were deleted from; dead tuples are
+  left to autovacuum
+
+Results of the last run are kept in `maintenance.last_run` and shown by
+GET /api/admin/maintenance. MAINTENANCE_INTERVAL=0 disables the task (for
+example in all but one worker process).
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from database import CartItem, IdempotencyKey, WishlistItem, IS_SQLITE, engine, write_lock, write_session
+from guests import purge_expired_guests
+from idempotency import idempotency
+from search_index import rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = float(os.environ.get("MAINTENANCE_INTERVAL", "3600"))
+# First run this long after startup, so it does not slow down boot
+MAINTENANCE_STARTUP_DELAY = float(os.environ.get("MAINTENANCE_STARTUP_DELAY", "60"))
+VACUUM_INTERVAL = float(os.environ.get("VACUUM_INTERVAL", str(24 * 3600)))
+VACUUM_FREE_RATIO = float(os.environ.get("VACUUM_FREE_RATIO", "0.2"))
+
+# Tables the purges delete from (ANALYZEd on PostgreSQL after deletes)
+PURGED_TABLES = {
+    "cart": CartItem.__tablename__,
+    "wishlist": WishlistItem.__tablename__,
+    "idempotencyKeys": IdempotencyKey.__tablename__,
+}
+
+
+class MaintenanceTask:
+    """Runs run_once() on a schedule in the background"""
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL):
+        self.interval = interval
+        self.last_run: Optional[dict] = None
+        self.deleted_total: Dict[str, int] = dict.fromkeys(PURGED_TABLES, 0)
+        self._last_vacuum = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        await asyncio.sleep(MAINTENANCE_STARTUP_DELAY)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Database maintenance failed")
+                self.last_run = {"startedAt": datetime.utcnow(), "error": str(e)}
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> dict:
+        """Purge expired rows and tidy up the database; returns the run's results"""
+        started = time.monotonic()
+        run = {"startedAt": datetime.utcnow(), "error": None}
+
+        deleted = await purge_expired_guests()
+        async with write_session() as db:
+            deleted["idempotencyKeys"] = await idempotency.purge(db, force=True)
+            await db.commit()
+        for name, count in deleted.items():
+            self.deleted_total[name] += count
+        run["deleted"] = deleted
+
+        if IS_SQLITE:
+            run.update(await self._sqlite_maintenance())
+        else:
+            run.update(await self._postgres_maintenance(deleted))
+
+        run["durationMs"] = round((time.monotonic() - started) * 1000)
+        run["deletedTotal"] = dict(self.deleted_total)
+        self.last_run = run
+        logger.info(f"Database maintenance: deleted {deleted}, vacuumed={run.get('vacuumed', False)}")
+        return run
+
+    async def _sqlite_maintenance(self) -> dict:
+        # Holding the write lock keeps this process's writers out while the
+        # database is rewritten; they queue and continue afterwards.
+        async with write_lock():
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.exec_driver_sql("ANALYZE")
+
+                page_count = (await conn.exec_driver_sql("PRAGMA page_count")).scalar() or 0
+                free_pages = (await conn.exec_driver_sql("PRAGMA freelist_count")).scalar() or 0
+                free_ratio = free_pages / page_count if page_count else 0.0
+
+                vacuumed = False
+                due = time.monotonic() - self._last_vacuum >= VACUUM_INTERVAL
+                if due and free_ratio >= VACUUM_FREE_RATIO:
+                    await conn.exec_driver_sql("VACUUM")
+                    await conn.run_sync(rebuild_search_index)
+                    self._last_vacuum = time.monotonic()
+                    vacuumed = True
+
+        return {"analyzed": True, "freePageRatio": round(free_ratio, 3), "vacuumed": vacuumed}
+
+    async def _postgres_maintenance(self, deleted: Dict[str, int]) -> dict:
+        tables = [PURGED_TABLES[name] for name, count in deleted.items() if count]
+        if tables:
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                for table_name in tables:
+                    await conn.execute(text(f'ANALYZE "{table_name}"'))
+        return {"analyzed": bool(tables), "vacuumed": False}
+
+
+maintenance = MaintenanceTask()
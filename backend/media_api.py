@@ -4,7 +4,8 @@ Media Library API endpoints for CMS
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, func
-from database import get_db, MediaFile
+from database import get_db, read_db, get_write_db, MediaFile
+from serialization import ORJSONResponse
 from admin_auth import get_current_admin
 from pydantic import BaseModel
 from typing import List, Optional
@@ -13,7 +14,7 @@ import os
 import uuid
 import shutil
 
-media_router = APIRouter(prefix="/api/media", tags=["Media"])
+media_router = APIRouter(prefix="/api/media", tags=["Media"], default_response_class=ORJSONResponse)
 
 # Upload directory
 UPLOAD_DIR = Path(__file__).parent / "uploads"
@@ -67,7 +68,7 @@ async def get_media_files(
     folder: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(read_db(max_lag=1))
 ):
     """Get all media files with optional filtering"""
     query = select(MediaFile)
@@ -84,7 +85,7 @@ async def get_media_files(
     result = await db.execute(query)
     files = result.scalars().all()
     
-    return [
+    return ORJSONResponse([
         {
             "id": f.id,
             "filename": f.filename,
@@ -99,11 +100,11 @@ async def get_media_files(
             "created_at": f.created_at.isoformat() if f.created_at else None
         }
         for f in files
-    ]
+    ])
 
 
 @media_router.get("/files/{file_id}")
-async def get_media_file(file_id: str, db: AsyncSession = Depends(get_db)):
+async def get_media_file(file_id: str, db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get a single media file by ID"""
     result = await db.execute(
         select(MediaFile).where(MediaFile.id == file_id)
@@ -113,7 +114,7 @@ async def get_media_file(file_id: str, db: AsyncSession = Depends(get_db)):
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    return {
+    return ORJSONResponse({
         "id": file.id,
         "filename": file.filename,
         "original_name": file.original_name,
@@ -125,7 +126,7 @@ async def get_media_file(file_id: str, db: AsyncSession = Depends(get_db)):
         "title": file.title,
         "folder": file.folder,
         "created_at": file.created_at.isoformat() if file.created_at else None
-    }
+    })
 
 
 @media_router.post("/upload")
@@ -135,7 +136,7 @@ async def upload_media_file(
     alt_text: str = Form(default=""),
     title: str = Form(default=""),
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Upload a new media file"""
     # Validate file type
@@ -206,7 +207,7 @@ async def update_media_file(
     file_id: str,
     update_data: MediaFileUpdate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update media file metadata"""
     result = await db.execute(
@@ -233,7 +234,7 @@ async def update_media_file(
 async def delete_media_file(
     file_id: str,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Delete a media file"""
     result = await db.execute(
@@ -33,6 +33,33 @@ class ProductCreate(BaseModel):
     stock: int = 100
 
 
+class ProductSuggestion(BaseModel):
+    id: str
+    name: str
+    image: str
+    price: float
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    min: float
+    max: Optional[float] = None  # None = open-ended last bucket
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    categories: List[FacetCount] = []
+    badges: List[FacetCount] = []
+    priceBuckets: List[PriceBucket] = []
+    minPrice: Optional[float] = None
+    maxPrice: Optional[float] = None
+
+
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
     price: Optional[float] = None
@@ -69,12 +96,45 @@ class CartItem(BaseModel):
 
 class CartItemCreate(BaseModel):
     productId: str
-    quantity: int = 1
+    quantity: int = Field(1, gt=0)
     userId: Optional[str] = "guest"
 
 
-class CartItemUpdate(BaseModel):
+class CartLineCreate(BaseModel):
+    productId: str
+    quantity: int = Field(1, gt=0)
+
+
+class CartItemsCreate(BaseModel):
+    items: List[CartLineCreate] = Field(min_length=1, max_length=100)
+    userId: Optional[str] = "guest"
+
+
+class CartLine(BaseModel):
+    id: str
+    productId: str
+    productName: str
+    productImage: str
+    price: float  # current product price
     quantity: int
+    stock: int
+    available: bool  # product still exists
+    inStock: bool  # enough stock for the quantity
+    lineTotal: float
+
+
+class CartSummary(BaseModel):
+    userId: str
+    items: List[CartLine]
+    itemCount: int
+    subtotal: float
+    freeDeliveryFrom: float
+    amountToFreeDelivery: float
+    freeDelivery: bool
+
+
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(gt=0)
 
 
 # Wishlist Models
@@ -90,6 +150,16 @@ class WishlistItemCreate(BaseModel):
     userId: Optional[str] = "guest"
 
 
+class WishlistItemsUpdate(BaseModel):
+    productIds: List[str] = Field(min_length=1, max_length=100)
+    userId: Optional[str] = "guest"
+
+
+class GuestMerge(BaseModel):
+    guestId: str  # per-visitor "guest-..." id
+    userId: str
+
+
 # Order Models
 class OrderItem(BaseModel):
     productId: str
@@ -99,6 +169,10 @@ class OrderItem(BaseModel):
     quantity: int
 
 
+class OrderItemCreate(OrderItem):
+    quantity: int = Field(gt=0)
+
+
 class Order(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     userId: Optional[str] = "guest"
@@ -116,8 +190,8 @@ class Order(BaseModel):
 
 
 class OrderCreate(BaseModel):
-    items: List[OrderItem]
-    totalAmount: float
+    items: List[OrderItemCreate] = Field(min_length=1)
+    totalAmount: Optional[float] = None  # ignored, recomputed from current prices
     customerName: str
     customerPhone: str
     customerEmail: Optional[str] = None
@@ -145,7 +219,7 @@ class QuickOrder(BaseModel):
 
 class QuickOrderCreate(BaseModel):
     productId: str
-    quantity: int = 1
+    quantity: int = Field(1, gt=0)
     customerName: str
     customerPhone: str
     notes: Optional[str] = None
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination for product listings
+
+A page is fetched with `WHERE (sort_key, id) > (:last_key, :last_id)` over a
+composite (sort_key, id) index instead of OFFSET, so deep pages cost the
+same as the first one. The cursor handed to clients is opaque (urlsafe
+base64 of the last row's sort key and id).
+"""
+import base64
+import binascii
+import json
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+
+from database import Product
+
+PRODUCTS_PAGE_SIZE = 60
+MAX_PAGE_SIZE = 500
+
+# sortBy -> (sort column, descending); backed by ix_products_<column>_id
+KEYSET_SORTS = {
+    "name": (Product.name, False),
+    "price": (Product.price, False),
+    "-price": (Product.price, True),
+}
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed or was issued for a different sort order"""
+
+
+def make_cursor(sort_by: str, key, last_id: str) -> str:
+    """Opaque cursor pointing just past the row with (sort key, id)"""
+    payload = {"s": sort_by, "k": key, "id": last_id}
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def encode_cursor(sort_by: str, product) -> str:
+    """Opaque cursor pointing just past `product`"""
+    column, _ = KEYSET_SORTS[sort_by]
+    return make_cursor(sort_by, getattr(product, column.key), product.id)
+
+
+def decode_cursor(cursor: str, sort_by: str) -> Tuple[object, str]:
+    """Return (last sort key, last id) from a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        key, last_id = payload["k"], payload["id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+    if payload.get("s") != sort_by:
+        raise InvalidCursor("Cursor does not match sort order")
+    column, _ = KEYSET_SORTS[sort_by]
+    if not isinstance(last_id, str) or not _is_sort_key(column, key):
+        raise InvalidCursor("Invalid cursor")
+    return key, last_id
+
+
+def _is_sort_key(column, key) -> bool:
+    """Whether a decoded key can be compared with the column's values"""
+    if column.type.python_type is float:
+        return isinstance(key, (int, float)) and not isinstance(key, bool) and math.isfinite(key)
+    return isinstance(key, column.type.python_type)
+
+
+def apply_keyset(query: Select, sort_by: str, cursor: Optional[str]) -> Select:
+    """Order by (sort key, id) and continue after the cursor position"""
+    column, descending = KEYSET_SORTS[sort_by]
+
+    if cursor:
+        key, last_id = decode_cursor(cursor, sort_by)
+        position = tuple_(column, Product.id)
+        query = query.where(
+            position < tuple_(key, last_id) if descending else position > tuple_(key, last_id)
+        )
+
+    if descending:
+        return query.order_by(column.desc(), Product.id.desc())
+    return query.order_by(column.asc(), Product.id.asc())
+
+
+def split_page(sort_by: str, rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """Trim a limit+1 fetch to one page and build the next cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(sort_by, page[-1])
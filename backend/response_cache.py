@@ -0,0 +1,150 @@
+"""
+In-process cache for public GET endpoints
+
+Categories, site settings, CMS pages/hero/footer links, menu items and blog
+post lists are requested on every page load but change only through admin
+writes. Their encoded response bodies are cached per route + query
+parameters, with LRU eviction (RESPONSE_CACHE_MAX_ENTRIES) and a TTL
+(RESPONSE_CACHE_TTL, which also bounds staleness in other worker
+processes).
+
+Each cached route carries tags; write handlers drop every entry with a
+tag they affect:
+
+    @cms_router.get("/hero")
+    @cached("cms_hero")
+    async def get_hero_section(...): ...
+
+    @cms_router.put("/hero")
+    @invalidates("cms_hero")
+    async def update_hero_section(...): ...
+
+Set RESPONSE_CACHE=0 to disable.
+"""
+import functools
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from serialization import ORJSONResponse
+
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE", "1") != "0"
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+# Larger bodies are served but not cached
+RESPONSE_CACHE_MAX_BODY = 1024 * 1024
+
+CacheKey = Tuple[str, tuple]
+
+
+class ResponseCache:
+    """LRU + TTL map of cache key -> encoded JSON body, indexed by tag"""
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, bytes, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[CacheKey]] = {}
+        # Bumped on invalidation, so a response computed before a write is not stored after it
+        self._generations: Dict[str, int] = {}
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, body, _ = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def generation(self, tags: Iterable[str]) -> tuple:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key: CacheKey, body: bytes, tags: Tuple[str, ...], generation: tuple) -> None:
+        """Store a body unless one of its tags was invalidated since `generation`"""
+        if generation != self.generation(tags) or len(body) > RESPONSE_CACHE_MAX_BODY:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, body, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags: str) -> None:
+        """Drop all entries carrying any of the tags"""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in self._keys_by_tag.pop(tag, ()):
+                self._remove(key)
+
+    def clear(self) -> None:
+        for tag in list(self._keys_by_tag):
+            self.invalidate(tag)
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+
+response_cache = ResponseCache()
+
+
+def _cache_key(endpoint, kwargs: dict) -> CacheKey:
+    """Route + its query/path parameters (dependencies such as sessions are skipped)"""
+    params = tuple(sorted(
+        (name, value) for name, value in kwargs.items()
+        if value is None or isinstance(value, (str, int, float, bool))
+    ))
+    return f"{endpoint.__module__}.{endpoint.__qualname__}", params
+
+
+def cached(*tags: str):
+    """Cache a GET endpoint's 200 JSON responses under the given tags"""
+    def decorate(endpoint):
+        if not RESPONSE_CACHE_ENABLED:
+            return endpoint
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            key = _cache_key(endpoint, kwargs)
+            body = response_cache.get(key)
+            if body is not None:
+                return Response(content=body, media_type="application/json", headers={"X-Cache": "HIT"})
+
+            generation = response_cache.generation(tags)
+            result = await endpoint(*args, **kwargs)
+            if not isinstance(result, Response):
+                result = ORJSONResponse(jsonable_encoder(result))
+            if result.status_code == 200:
+                response_cache.set(key, result.body, tags, generation)
+            return result
+
+        return wrapper
+    return decorate
+
+
+def invalidates(*tags: str):
+    """Drop cached responses with the given tags after a write endpoint runs"""
+    def decorate(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                response_cache.invalidate(*tags)
+
+        return wrapper
+    return decorate
@@ -0,0 +1,145 @@
+"""
+Daily sales rollup (`daily_sales`)
+
+Analytics read per-day, per-status totals from this table instead of
+re-aggregating `orders`. Rows are keyed by (local date in the shop
+timezone, status) and are updated by the order write handlers inside the
+same transaction as the order change, so they never drift from the orders.
+Saving a new shop timezone rebuilds the table in the settings transaction,
+so later status changes subtract from the day the order was counted on.
+
+After editing orders outside the API, rebuild the table:
+
+    python sales_rollup.py
+"""
+import asyncio
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from admin_stats import shop_timezone, to_local_date
+from database import DailySales, Order, QuickOrder, insert_for, init_db, write_session
+
+COUNTERS = (
+    "order_count", "revenue", "item_count",
+    "quick_order_count", "quick_revenue", "quick_item_count",
+)
+
+
+def _item_count(items) -> int:
+    """Units in an Order.items list; malformed legacy lines count as none"""
+    count = 0
+    for item in items if isinstance(items, list) else []:
+        try:
+            count += int(item.get("quantity") or 1)
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return count
+
+
+async def _add(db: AsyncSession, day: date, status: str, **deltas) -> None:
+    """Add deltas to one (date, status) row, creating it if needed"""
+    values = {name: deltas.get(name, 0) for name in COUNTERS}
+    insert = insert_for(db.get_bind().dialect.name)
+    stmt = insert(DailySales).values(date=day, status=status, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySales.date, DailySales.status],
+        set_={name: getattr(DailySales, name) + stmt.excluded[name] for name in COUNTERS},
+    )
+    await db.execute(stmt)
+
+
+# ============ INCREMENTAL UPDATES ============
+
+async def record_order(db: AsyncSession, order: Order) -> None:
+    """Count a new order (call after flush, before commit)"""
+    day = to_local_date(order.created_at, await shop_timezone(db))
+    await _add(
+        db, day, order.status,
+        order_count=1, revenue=order.total_amount, item_count=_item_count(order.items),
+    )
+
+
+async def record_quick_order(db: AsyncSession, quick_order: QuickOrder) -> None:
+    """Count a new quick order (call after flush, before commit)"""
+    day = to_local_date(quick_order.created_at, await shop_timezone(db))
+    await _add(
+        db, day, quick_order.status,
+        quick_order_count=1,
+        quick_revenue=quick_order.price * quick_order.quantity,
+        quick_item_count=quick_order.quantity,
+    )
+
+
+async def record_status_change(db: AsyncSession, order: Order, old_status: str) -> None:
+    """Move an order's totals from its old status row to the new one"""
+    if old_status == order.status:
+        return
+    day = to_local_date(order.created_at, await shop_timezone(db))
+    revenue = order.total_amount
+    items = _item_count(order.items)
+    await _add(db, day, old_status, order_count=-1, revenue=-revenue, item_count=-items)
+    await _add(db, day, order.status, order_count=1, revenue=revenue, item_count=items)
+
+
+# ============ REBUILD ============
+
+async def rebuild_daily_sales(db: AsyncSession) -> int:
+    """Recompute the whole table from orders and quick orders; returns row count"""
+    tz = await shop_timezone(db)
+    totals: Dict[Tuple[date, str], Dict[str, float]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    result = await db.stream(
+        select(Order.created_at, Order.status, Order.total_amount, Order.items)
+    )
+    async for created_at, status, total_amount, items in result:
+        row = totals[(to_local_date(created_at, tz), status)]
+        row["order_count"] += 1
+        row["revenue"] += total_amount
+        row["item_count"] += _item_count(items)
+
+    result = await db.stream(
+        select(QuickOrder.created_at, QuickOrder.status, QuickOrder.price, QuickOrder.quantity)
+    )
+    async for created_at, status, price, quantity in result:
+        row = totals[(to_local_date(created_at, tz), status)]
+        row["quick_order_count"] += 1
+        row["quick_revenue"] += price * quantity
+        row["quick_item_count"] += quantity
+
+    await db.execute(delete(DailySales))
+    if totals:
+        await db.execute(
+            DailySales.__table__.insert(),
+            [{"date": day, "status": status, **values} for (day, status), values in totals.items()],
+        )
+    return len(totals)
+
+
+async def ensure_daily_sales(db: AsyncSession) -> None:
+    """Backfill the rollup on first start after the table was added"""
+    has_rollup = (await db.execute(select(DailySales.date).limit(1))).first()
+    if has_rollup:
+        return
+    has_orders = (await db.execute(select(func.count()).select_from(Order))).scalar()
+    has_quick_orders = (await db.execute(select(func.count()).select_from(QuickOrder))).scalar()
+    if has_orders or has_quick_orders:
+        await rebuild_daily_sales(db)
+        await db.commit()
+
+
+async def main():
+    """Rebuild daily_sales from scratch"""
+    print("📊 Rebuilding daily_sales...")
+    await init_db()
+    async with write_session() as db:
+        rows = await rebuild_daily_sales(db)
+        await db.commit()
+    print(f"✅ daily_sales rebuilt: {rows} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Search text analysis for the product catalog
+
+The same pipeline runs at write time (to fill the precomputed search
+columns of `products`) and at query time, so "туя смарагд", "tuya smaragd"
+and "Туї" all reduce to the same index terms:
+
+    lowercase -> strip apostrophes -> Latin->Cyrillic -> fold letters -> stem
+"""
+import re
+from typing import List
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+LATIN_RE = re.compile(r"[a-z]")
+
+# Ukrainian apostrophe variants (ʼ ’ ‘ ' ` ´) are dropped inside words
+APOSTROPHES = str.maketrans("", "", "ʼ’‘'`´")
+
+# Latin -> Cyrillic, longest sequences first (greedy match)
+LATIN_TO_CYRILLIC = [
+    ("shch", "щ"), ("sch", "щ"),
+    ("zh", "ж"), ("kh", "х"), ("ch", "ч"), ("sh", "ш"), ("ts", "ц"),
+    ("th", "т"), ("ph", "ф"),
+    ("ya", "я"), ("yu", "ю"), ("ye", "є"), ("yi", "ї"), ("yo", "йо"),
+    ("ja", "я"), ("ju", "ю"), ("je", "є"), ("jo", "йо"),
+    ("a", "а"), ("b", "б"), ("c", "к"), ("d", "д"), ("e", "е"), ("f", "ф"),
+    ("g", "г"), ("h", "г"), ("i", "і"), ("j", "й"), ("k", "к"), ("l", "л"),
+    ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"), ("q", "к"), ("r", "р"),
+    ("s", "с"), ("t", "т"), ("u", "у"), ("v", "в"), ("w", "в"), ("x", "кс"),
+    ("y", "и"), ("z", "з"),
+]
+LATIN_RE_GREEDY = re.compile("|".join(re.escape(src) for src, _ in LATIN_TO_CYRILLIC))
+LATIN_MAP = dict(LATIN_TO_CYRILLIC)
+
+# Letters that customers use interchangeably (Ukrainian/Russian layouts, і/и, й)
+FOLD = str.maketrans({
+    "і": "и", "ї": "и", "й": "и", "ы": "и",
+    "є": "е", "э": "е", "ё": "е",
+    "ґ": "г",
+    "ь": None, "ъ": None,
+})
+
+# Inflectional endings after folding, longest first
+SUFFIXES = [
+    "ами", "ями", "ого", "ому", "ими",
+    "ою", "ею", "ям", "ам", "ах", "ях", "ом", "ем", "ив", "ии", "ои",
+    "а", "я", "у", "ю", "о", "е", "и",
+]
+MIN_STEM = 2
+
+
+# ============ PIPELINE STEPS ============
+
+def normalize(text: str) -> str:
+    """Lowercase and drop apostrophes"""
+    return text.lower().translate(APOSTROPHES)
+
+
+def transliterate(token: str) -> str:
+    """Convert Latin letters of a token to Cyrillic"""
+    if not LATIN_RE.search(token):
+        return token
+    return LATIN_RE_GREEDY.sub(lambda m: LATIN_MAP[m.group(0)], token)
+
+
+def fold(token: str) -> str:
+    """Collapse interchangeable letters to one form"""
+    return token.translate(FOLD)
+
+
+def stem(token: str) -> str:
+    """Strip one inflectional ending (light Ukrainian stemmer)"""
+    if any(ch.isdigit() for ch in token):
+        return token
+    for suffix in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[: -len(suffix)]
+    return token
+
+
+# ============ PUBLIC API ============
+
+def analyze(text: str) -> List[str]:
+    """Turn free text into index terms"""
+    if not text:
+        return []
+    terms = []
+    for token in TOKEN_RE.findall(normalize(text)):
+        term = stem(fold(transliterate(token)))
+        if term:
+            terms.append(term)
+    return terms
+
+
+def to_search_text(*parts: str) -> str:
+    """Precomputed search column value: analyzed terms joined by spaces"""
+    return " ".join(term for part in parts for term in analyze(part or ""))
@@ -0,0 +1,205 @@
+"""
+Full-text search index for products
+
+The index is built over the precomputed `search_name` / `search_description`
+columns (filled at write time by search_analysis.to_search_text), and query
+strings go through the same analysis pipeline before matching.
+
+SQLite: FTS5 external-content table `products_fts` kept in sync by triggers.
+PostgreSQL: generated `search_vector` tsvector column with a GIN index.
+Any other dialect falls back to LIKE over the search columns.
+"""
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, false, func, literal, literal_column, or_, table, column, text
+from sqlalchemy.sql import Select
+
+from search_analysis import analyze, to_search_text
+
+FTS_TABLE = "products_fts"
+
+# Columns indexed by the full-text index, in bm25 weight order
+FTS_COLUMNS = ["search_name", "search_description"]
+FTS_WEIGHTS = [10.0, 1.0]
+
+# Bump when the PostgreSQL search_vector expression changes
+PG_SEARCH_VECTOR_VERSION = "search_vector:v2"
+
+BACKFILL_BATCH = 500
+
+
+# ============ INDEX SETUP ============
+
+def backfill_search_columns(connection) -> int:
+    """Fill search columns for rows written before they existed"""
+    rows = connection.exec_driver_sql(
+        "SELECT id, name, article, description FROM products "
+        "WHERE search_name IS NULL"
+    ).fetchall()
+
+    for start in range(0, len(rows), BACKFILL_BATCH):
+        connection.execute(
+            text(
+                "UPDATE products SET search_name = :search_name, "
+                "search_description = :search_description WHERE id = :id"
+            ),
+            [
+                {
+                    "id": product_id,
+                    "search_name": to_search_text(name, article),
+                    "search_description": to_search_text(description),
+                }
+                for product_id, name, article, description in rows[start:start + BACKFILL_BATCH]
+            ],
+        )
+    return len(rows)
+
+
+def _setup_sqlite(connection) -> None:
+    """Create FTS5 table and sync triggers; rebuild index if table is new or outdated"""
+    columns = ", ".join(FTS_COLUMNS)
+    new_columns = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_columns = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+    for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    backfilled = backfill_search_columns(connection)
+
+    existing = [
+        row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({FTS_TABLE})")
+    ]
+    if existing and existing != FTS_COLUMNS:
+        connection.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+        existing = []
+
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='products', content_rowid='rowid', "
+        f"tokenize='unicode61 remove_diacritics 0')"
+    )
+
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.rowid, {new_columns}); "
+        f"END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.rowid, {old_columns}); "
+        f"END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER products_fts_au AFTER UPDATE OF {columns} ON products BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.rowid, {old_columns}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.rowid, {new_columns}); "
+        f"END"
+    )
+
+    if not existing or backfilled:
+        rebuild_search_index(connection)
+
+
+def _setup_postgres(connection) -> None:
+    """Add generated tsvector column and GIN index"""
+    backfill_search_columns(connection)
+
+    current_version = connection.exec_driver_sql(
+        "SELECT col_description('products'::regclass, attnum) FROM pg_attribute "
+        "WHERE attrelid = 'products'::regclass AND attname = 'search_vector' "
+        "AND NOT attisdropped"
+    ).scalar()
+    if current_version is not None and current_version != PG_SEARCH_VECTOR_VERSION:
+        connection.exec_driver_sql("ALTER TABLE products DROP COLUMN search_vector")
+
+    connection.exec_driver_sql(
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(search_name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(search_description, '')), 'C')"
+        ") STORED"
+    )
+    connection.exec_driver_sql(
+        f"COMMENT ON COLUMN products.search_vector IS '{PG_SEARCH_VECTOR_VERSION}'"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_products_search_vector "
+        "ON products USING GIN (search_vector)"
+    )
+
+
+def setup_search_index(connection) -> None:
+    """Create the full-text index for the connection's dialect (idempotent)"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        _setup_sqlite(connection)
+    elif dialect == "postgresql":
+        _setup_postgres(connection)
+    else:
+        backfill_search_columns(connection)
+
+
+def rebuild_search_index(connection) -> None:
+    """Re-index all products from scratch.
+
+    Needed on SQLite after VACUUM, which may renumber the implicit rowids
+    the FTS table points at.
+    """
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+# ============ QUERYING ============
+
+def _fts5_query(terms: list) -> str:
+    """FTS5 MATCH expression: all terms required, the last one as a prefix"""
+    quoted = ['"{}"'.format(t.replace('"', '""')) for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _tsquery(terms: list) -> str:
+    """to_tsquery expression: all terms required, the last one as a prefix"""
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def apply_search(
+    query: Select, search: str, dialect: str
+) -> Tuple[Select, Optional[object]]:
+    """Restrict a products query to search hits.
+
+    Returns the filtered query and a rank expression to order by
+    (ascending = best match first), or None if the dialect has no index.
+    A search with no usable terms (punctuation, one-letter words) matches
+    nothing.
+    """
+    terms = analyze(search)
+    if not terms:
+        return query.where(false()), None
+
+    if dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"))
+        fts_table = literal_column(FTS_TABLE)
+        query = query.join(
+            fts, fts.c.rowid == literal_column("products.rowid")
+        ).where(fts_table.op("MATCH")(_fts5_query(terms)))
+        rank = func.bm25(fts_table, *[literal(w) for w in FTS_WEIGHTS])
+        return query, rank
+
+    if dialect == "postgresql":
+        ts_query = func.to_tsquery("simple", _tsquery(terms))
+        search_vector = literal_column("products.search_vector")
+        query = query.where(search_vector.op("@@")(ts_query))
+        return query, -func.ts_rank(search_vector, ts_query)
+
+    query = query.where(
+        and_(*[
+            or_(*[literal_column(f"products.{c}").like(f"%{t}%") for c in FTS_COLUMNS])
+            for t in terms
+        ])
+    )
+    return query, None
@@ -0,0 +1,100 @@
+"""
+Fast JSON output for the hot read endpoints
+
+Products are encoded straight from ORM rows with orjson (no per-row pydantic
+model + response_model re-validation). Each product's bytes are cached under
+its (id, updated_at) version, so a list response is just the cached blobs
+joined into a JSON array.
+
+All routers use ORJSONResponse as their default response class.
+"""
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+
+__all__ = [
+    "ORJSONResponse",
+    "decode_badges",
+    "product_dict",
+    "ProductJSONCache",
+    "product_json",
+    "wishlist_json",
+    "json_response",
+]
+
+
+def decode_badges(badges) -> List[str]:
+    """Badges column as a list (older rows store it as a JSON string)"""
+    if isinstance(badges, str):
+        return json.loads(badges)
+    return badges or []
+
+
+def product_dict(p) -> dict:
+    """API representation of a product row (same shape as models.Product)"""
+    return {
+        "id": p.id,
+        "name": p.name,
+        "article": p.article,
+        "price": float(p.price),
+        "oldPrice": float(p.old_price) if p.old_price is not None else None,
+        "discount": p.discount or 0,
+        "image": p.image,
+        "category": p.category,
+        "badges": decode_badges(p.badges),
+        "description": p.description,
+        "stock": p.stock if p.stock is not None else 100,
+        "createdAt": p.created_at,
+    }
+
+
+class ProductJSONCache:
+    """Encoded product JSON, reused until the row's updated_at changes"""
+
+    def __init__(self):
+        self._blobs: Dict[str, Tuple[object, bytes]] = {}
+
+    def get(self, p) -> bytes:
+        """Encoded JSON object for one product row"""
+        version = p.updated_at or p.created_at
+        cached = self._blobs.get(p.id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        blob = orjson.dumps(product_dict(p))
+        self._blobs[p.id] = (version, blob)
+        return blob
+
+    def many(self, products: Iterable) -> bytes:
+        """Encoded JSON array of product rows"""
+        return b"[" + b",".join(self.get(p) for p in products) + b"]"
+
+    def discard(self, product_id: str) -> None:
+        """Forget a deleted product"""
+        self._blobs.pop(product_id, None)
+
+
+product_json = ProductJSONCache()
+
+
+def wishlist_json(rows: Iterable[tuple]) -> bytes:
+    """Encoded wishlist items with their product embedded, from
+    (WishlistItem, Product or None) rows"""
+    items = []
+    for item, product in rows:
+        fields = orjson.dumps({
+            "id": item.id,
+            "productId": item.product_id,
+            "userId": item.user_id,
+            "createdAt": item.created_at,
+        })
+        embedded = product_json.get(product) if product is not None else b"null"
+        items.append(fields[:-1] + b',"product":' + embedded + b"}")
+    return b"[" + b",".join(items) + b"]"
+
+
+def json_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    """Response for an already encoded JSON body"""
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,8 +1,8 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, Header, UploadFile, File
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from sqlalchemy import select, update, delete, or_, and_, func
+from sqlalchemy import select, update, delete, or_, func, cast, String
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import json
@@ -18,17 +18,36 @@ from cms_api import cms_router
 from blog_api import blog_router, menu_router
 from media_api import media_router
 from models import (
-    Product as ProductSchema, ProductCreate, ProductUpdate,
+    Product as ProductSchema, ProductCreate, ProductUpdate, ProductSuggestion, ProductFacets,
     Category as CategorySchema, CategoryCreate,
-    CartItem as CartItemSchema, CartItemCreate, CartItemUpdate,
-    WishlistItem as WishlistItemSchema, WishlistItemCreate,
+    CartItem as CartItemSchema, CartItemCreate, CartItemsCreate, CartItemUpdate, CartSummary,
+    WishlistItem as WishlistItemSchema, WishlistItemCreate, WishlistItemsUpdate, GuestMerge,
     Order as OrderSchema, OrderCreate,
     QuickOrder as QuickOrderSchema, QuickOrderCreate
 )
 from database import (
-    Product, Category, CartItem, WishlistItem, Order, QuickOrder, SiteSettings,
-    get_db, init_db, close_db
+    Product, Category, CartItem, WishlistItem, Customer, Order, OrderItem, QuickOrder, SiteSettings,
+    get_db, get_read_db, read_db, get_write_db, write_session, init_db, close_db
 )
+from pagination import (
+    PRODUCTS_PAGE_SIZE, MAX_PAGE_SIZE, KEYSET_SORTS, InvalidCursor,
+    apply_keyset, split_page
+)
+from search_index import apply_search
+from facets import compute_facets
+from suggest_index import suggest_index
+from catalog_snapshot import CATALOG_SNAPSHOT_ENABLED, catalog, list_products, product_facets, products_by_ids
+from serialization import ORJSONResponse, json_response, product_json, wishlist_json
+from admin_stats import ORDER_STATUSES, OPEN_STATUSES, MAX_CHART_DAYS, dashboard_aggregates, daily_order_totals, top_products
+from sales_rollup import record_order, record_quick_order, record_status_change, ensure_daily_sales, rebuild_daily_sales
+from customers import normalize_phone, record_customer_order, record_customer_status_change
+from checkout import InsufficientStock, ProductNotFound, merge_quantities, order_total, release_stock, reserve_stock
+from cart import add_cart_items, cart_rows, cart_summary
+from wishlist import add_wishlist_items, remove_wishlist_items, wishlist_contains
+from guests import GUEST_PREFIX, is_guest_id, merge_guest
+from maintenance import maintenance
+from response_cache import cached, invalidates
+from idempotency import InvalidIdempotencyKey, encode_response, idempotency, request_fingerprint
 from admin_auth import authenticate_admin, create_access_token, get_current_admin
 from admin_models import (
     AdminLogin, AdminToken, DashboardStats, RevenueData, TopProduct,
@@ -40,7 +59,7 @@ ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Mount uploads directory for serving images
 UPLOAD_DIR = Path(__file__).parent / "uploads"
@@ -48,43 +67,40 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", default_response_class=ORJSONResponse)
+
+# Largest ?ids= list accepted by the batch lookup endpoints
+MAX_BATCH_IDS = 100
 
 
 # ==================== PRODUCTS ENDPOINTS ====================
 
-@api_router.get("/products", response_model=List[ProductSchema])
-async def get_products(
-    search: Optional[str] = Query(None, description="Search by product name or description"),
-    category: Optional[str] = Query(None, description="Filter by category"),
-    badge: Optional[str] = Query(None, description="Filter by badge (hit, sale, new)"),
-    minPrice: Optional[float] = Query(None, description="Minimum price"),
-    maxPrice: Optional[float] = Query(None, description="Maximum price"),
-    sortBy: Optional[str] = Query("name", description="Sort by: name, price, -price (desc)"),
-    limit: Optional[int] = Query(500, description="Limit results"),
-    skip: Optional[int] = Query(0, description="Skip results for pagination"),
-    db: AsyncSession = Depends(get_db)
+def filter_products(
+    db: AsyncSession,
+    search: Optional[str],
+    category: Optional[str],
+    badge: Optional[str],
+    minPrice: Optional[float],
+    maxPrice: Optional[float]
 ):
-    """Get all products with optional filtering, searching, and sorting"""
+    """Build the filtered products query shared by listing and facets.
+    
+    Returns (query, rank); rank is the search relevance expression or None.
+    """
     query = select(Product)
+    rank = None
     
-    # Search filter
+    # Search filter (full-text index, ranked)
     if search:
-        query = query.where(
-            or_(
-                Product.name.ilike(f"%{search}%"),
-                Product.description.ilike(f"%{search}%"),
-                Product.article.ilike(f"%{search}%")
-            )
-        )
+        query, rank = apply_search(query, search, db.get_bind().dialect.name)
     
     # Category filter
     if category:
         query = query.where(Product.category.ilike(f"%{category}%"))
     
-    # Badge filter
+    # Badge filter (badges is a JSON list; match the quoted element)
     if badge:
-        query = query.where(Product.badges.contains([badge]))
+        query = query.where(cast(Product.badges, String).like(f'%"{badge}"%'))
     
     # Price filter
     if minPrice is not None:
@@ -92,77 +108,146 @@ async def get_products(
     if maxPrice is not None:
         query = query.where(Product.price <= maxPrice)
     
+    return query, rank
+
+
+@api_router.get("/products", response_model=List[ProductSchema])
+async def get_products(
+    search: Optional[str] = Query(None, description="Full-text search by product name, article or description"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    badge: Optional[str] = Query(None, description="Filter by badge (hit, sale, new)"),
+    minPrice: Optional[float] = Query(None, description="Minimum price"),
+    maxPrice: Optional[float] = Query(None, description="Maximum price"),
+    sortBy: Optional[str] = Query(None, description="Sort by: name, price, -price (desc), relevance (default when searching)"),
+    limit: int = Query(PRODUCTS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    skip: Optional[int] = Query(0, ge=0, description="Offset pagination (only for relevance sort)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get products with optional filtering, searching, and sorting.
+    
+    name/price/-price orderings are paginated by cursor: the next page's
+    cursor is returned in the X-Next-Cursor header (absent on the last page).
+    """
+    if CATALOG_SNAPSHOT_ENABLED:
+        try:
+            body, next_cursor = await list_products(
+                db, search, category, badge, minPrice, maxPrice, sortBy, cursor, limit, skip
+            )
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        return json_response(body, headers)
+    
+    query, rank = filter_products(db, search, category, badge, minPrice, maxPrice)
+    headers = None
+    
     # Sort configuration
-    if sortBy == "price":
-        query = query.order_by(Product.price.asc())
-    elif sortBy == "-price":
-        query = query.order_by(Product.price.desc())
-    elif sortBy == "name":
-        query = query.order_by(Product.name.asc())
+    if sortBy is None:
+        sortBy = "relevance" if rank is not None else "name"
+    
+    if sortBy == "relevance" and rank is not None:
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not available for relevance sort")
+        query = query.order_by(rank.asc(), Product.name.asc(), Product.id.asc())
+        query = query.offset(skip).limit(limit)
+        result = await db.execute(query)
+        products = result.scalars().all()
     else:
-        query = query.order_by(Product.name.asc())
+        if sortBy not in KEYSET_SORTS:
+            sortBy = "name"
+        
+        # Keyset pagination: fetch one extra row to know whether a next page exists
+        try:
+            query = apply_keyset(query, sortBy, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not cursor and skip:
+            query = query.offset(skip)
+        query = query.limit(limit + 1)
+        
+        result = await db.execute(query)
+        products, next_cursor = split_page(sortBy, result.scalars().all(), limit)
+        if next_cursor:
+            headers = {"X-Next-Cursor": next_cursor}
     
-    # Apply pagination
-    query = query.offset(skip).limit(limit)
+    return json_response(product_json.many(products), headers)
+
+
+@api_router.get("/products/facets", response_model=ProductFacets)
+async def get_product_facets(
+    search: Optional[str] = Query(None, description="Full-text search by product name, article or description"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    badge: Optional[str] = Query(None, description="Filter by badge (hit, sale, new)"),
+    minPrice: Optional[float] = Query(None, description="Minimum price"),
+    maxPrice: Optional[float] = Query(None, description="Maximum price"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Category, badge and price-bucket counts for the current filter (one grouped query)"""
+    if CATALOG_SNAPSHOT_ENABLED:
+        return ORJSONResponse(await product_facets(db, search, category, badge, minPrice, maxPrice))
     
-    # Execute query
-    result = await db.execute(query)
-    products = result.scalars().all()
+    query, _ = filter_products(db, search, category, badge, minPrice, maxPrice)
+    return ORJSONResponse(await compute_facets(db, query))
+
+
+@api_router.get("/products/suggest", response_model=List[ProductSuggestion])
+async def suggest_products(
+    q: str = Query(..., description="Search-as-you-type prefix"),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Typeahead suggestions served from the in-memory prefix index"""
+    await suggest_index.refresh_if_stale(db)
     
-    # Convert to response model
-    return [
-        ProductSchema(
-            id=p.id,
-            name=p.name,
-            article=p.article,
-            price=p.price,
-            oldPrice=p.old_price,
-            discount=p.discount,
-            image=p.image,
-            category=p.category,
-            badges=json.loads(p.badges) if isinstance(p.badges, str) else p.badges,
-            description=p.description,
-            stock=p.stock,
-            createdAt=p.created_at
-        )
-        for p in products
-    ]
+    return ORJSONResponse(suggest_index.suggest(q, limit))
+
+
+def _parse_ids(ids: str) -> List[str]:
+    """Comma-separated ids, deduplicated in order"""
+    product_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return product_ids
+
+
+@api_router.get("/products/batch", response_model=List[ProductSchema])
+async def get_products_batch(
+    ids: str = Query(..., description="Comma-separated product ids"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Several products by id in one request, in the requested order (unknown ids are skipped)"""
+    return json_response(await products_by_ids(db, _parse_ids(ids)))
 
 
 @api_router.get("/products/{product_id}", response_model=ProductSchema)
-async def get_product(product_id: str, db: AsyncSession = Depends(get_db)):
+async def get_product(product_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get a single product by ID"""
+    if CATALOG_SNAPSHOT_ENABLED:
+        body = (await catalog.get(db)).product_json(product_id)
+        if body is not None:
+            return json_response(body)
+    
     result = await db.execute(select(Product).where(Product.id == product_id))
     product = result.scalar_one_or_none()
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    return ProductSchema(
-        id=product.id,
-        name=product.name,
-        article=product.article,
-        price=product.price,
-        oldPrice=product.old_price,
-        discount=product.discount,
-        image=product.image,
-        category=product.category,
-        badges=json.loads(product.badges) if isinstance(product.badges, str) else product.badges,
-        description=product.description,
-        stock=product.stock,
-        createdAt=product.created_at
-    )
+    return json_response(product_json.get(product))
 
 
 @api_router.post("/products/bulk-import")
+@invalidates("products", "categories")
 async def bulk_import_products(
     products: List[ProductCreate],
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Bulk import products (Admin only)"""
     imported = 0
     errors = []
+    added = []
     
     for product_input in products:
         try:
@@ -180,12 +265,17 @@ async def bulk_import_products(
                 stock=product_input.stock
             )
             db.add(product)
+            added.append(product)
             imported += 1
         except Exception as e:
             errors.append(f"{product_input.name}: {str(e)}")
     
     await db.commit()
     
+    for product in added:
+        suggest_index.upsert(product)
+    await catalog.refresh(db)
+    
     return {
         "success": True,
         "imported": imported,
@@ -195,10 +285,11 @@ async def bulk_import_products(
 
 
 @api_router.post("/products", response_model=ProductSchema)
+@invalidates("products", "categories")
 async def create_product(
     product_input: ProductCreate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Create a new product (Admin only - future auth)"""
     product = Product(
@@ -217,29 +308,19 @@ async def create_product(
     db.add(product)
     await db.commit()
     await db.refresh(product)
+    suggest_index.upsert(product)
+    await catalog.refresh(db)
     
-    return ProductSchema(
-        id=product.id,
-        name=product.name,
-        article=product.article,
-        price=product.price,
-        oldPrice=product.old_price,
-        discount=product.discount,
-        image=product.image,
-        category=product.category,
-        badges=json.loads(product.badges) if isinstance(product.badges, str) else product.badges,
-        description=product.description,
-        stock=product.stock,
-        createdAt=product.created_at
-    )
+    return json_response(product_json.get(product))
 
 
 @api_router.put("/products/{product_id}", response_model=ProductSchema)
+@invalidates("products", "categories")
 async def update_product(
     product_id: str,
     update_data: ProductUpdate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update a product (Admin only - future auth)"""
     result = await db.execute(select(Product).where(Product.id == product_id))
@@ -264,28 +345,18 @@ async def update_product(
     
     await db.commit()
     await db.refresh(product)
+    suggest_index.upsert(product)
+    await catalog.refresh(db)
     
-    return ProductSchema(
-        id=product.id,
-        name=product.name,
-        article=product.article,
-        price=product.price,
-        oldPrice=product.old_price,
-        discount=product.discount,
-        image=product.image,
-        category=product.category,
-        badges=json.loads(product.badges) if isinstance(product.badges, str) else product.badges,
-        description=product.description,
-        stock=product.stock,
-        createdAt=product.created_at
-    )
+    return json_response(product_json.get(product))
 
 
 @api_router.delete("/products/{product_id}")
+@invalidates("products", "categories")
 async def delete_product(
     product_id: str,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Delete a product (Admin only - future auth)"""
     result = await db.execute(select(Product).where(Product.id == product_id))
@@ -296,6 +367,9 @@ async def delete_product(
     
     await db.delete(product)
     await db.commit()
+    suggest_index.remove(product_id)
+    product_json.discard(product_id)
+    await catalog.refresh(db)
     
     return {"message": "Product deleted successfully"}
 
@@ -303,8 +377,12 @@ async def delete_product(
 # ==================== CATEGORIES ENDPOINTS ====================
 
 @api_router.get("/categories", response_model=List[CategorySchema])
-async def get_categories(db: AsyncSession = Depends(get_db)):
+@cached("categories")
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     """Get all categories"""
+    if CATALOG_SNAPSHOT_ENABLED:
+        return json_response((await catalog.get(db)).categories_json)
+    
     result = await db.execute(select(Category))
     categories = result.scalars().all()
     
@@ -315,7 +393,7 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
 
 
 @api_router.get("/categories/{category_id}", response_model=CategorySchema)
-async def get_category(category_id: str, db: AsyncSession = Depends(get_db)):
+async def get_category(category_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get a single category by ID"""
     result = await db.execute(select(Category).where(Category.id == category_id))
     category = result.scalar_one_or_none()
@@ -328,90 +406,62 @@ async def get_category(category_id: str, db: AsyncSession = Depends(get_db)):
 
 # ==================== CART ENDPOINTS ====================
 
+def _cart_item_schema(item) -> CartItemSchema:
+    return CartItemSchema(
+        id=item.id,
+        productId=item.product_id,
+        productName=item.product_name,
+        productImage=item.product_image,
+        price=item.price,
+        quantity=item.quantity,
+        userId=item.user_id
+    )
+
+
 @api_router.post("/cart/add", response_model=CartItemSchema)
-async def add_to_cart(cart_item_input: CartItemCreate, db: AsyncSession = Depends(get_db)):
-    """Add item to cart"""
-    # Get product details
-    result = await db.execute(select(Product).where(Product.id == cart_item_input.productId))
-    product = result.scalar_one_or_none()
-    
-    if not product:
+async def add_to_cart(cart_item_input: CartItemCreate, db: AsyncSession = Depends(get_write_db)):
+    """Add item to cart (or increase its quantity)"""
+    try:
+        [item] = await add_cart_items(
+            db, cart_item_input.userId, [(cart_item_input.productId, cart_item_input.quantity)]
+        )
+    except ProductNotFound:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Product not found")
+    await db.commit()
     
-    # Check if item already exists in cart
-    result = await db.execute(
-        select(CartItem).where(
-            and_(
-                CartItem.product_id == cart_item_input.productId,
-                CartItem.user_id == cart_item_input.userId
-            )
+    return _cart_item_schema(item)
+
+
+@api_router.post("/cart/items", response_model=List[CartItemSchema])
+async def add_to_cart_batch(items_input: CartItemsCreate, db: AsyncSession = Depends(get_write_db)):
+    """Add several products to a cart in one request"""
+    try:
+        items = await add_cart_items(
+            db, items_input.userId, [(line.productId, line.quantity) for line in items_input.items]
         )
-    )
-    existing_item = result.scalar_one_or_none()
+    except ProductNotFound as e:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    await db.commit()
     
-    if existing_item:
-        # Update quantity
-        existing_item.quantity += cart_item_input.quantity
-        await db.commit()
-        await db.refresh(existing_item)
-        
-        return CartItemSchema(
-            id=existing_item.id,
-            productId=existing_item.product_id,
-            productName=existing_item.product_name,
-            productImage=existing_item.product_image,
-            price=existing_item.price,
-            quantity=existing_item.quantity,
-            userId=existing_item.user_id
-        )
-    else:
-        # Create new cart item
-        cart_item = CartItem(
-            product_id=cart_item_input.productId,
-            product_name=product.name,
-            product_image=product.image,
-            price=product.price,
-            quantity=cart_item_input.quantity,
-            user_id=cart_item_input.userId
-        )
-        
-        db.add(cart_item)
-        await db.commit()
-        await db.refresh(cart_item)
-        
-        return CartItemSchema(
-            id=cart_item.id,
-            productId=cart_item.product_id,
-            productName=cart_item.product_name,
-            productImage=cart_item.product_image,
-            price=cart_item.price,
-            quantity=cart_item.quantity,
-            userId=cart_item.user_id
-        )
+    return [_cart_item_schema(item) for item in items]
 
 
 @api_router.get("/cart", response_model=List[CartItemSchema])
 async def get_cart(userId: str = Query("guest"), db: AsyncSession = Depends(get_db)):
-    """Get cart items for a user"""
-    result = await db.execute(select(CartItem).where(CartItem.user_id == userId))
-    cart_items = result.scalars().all()
-    
-    return [
-        CartItemSchema(
-            id=item.id,
-            productId=item.product_id,
-            productName=item.product_name,
-            productImage=item.product_image,
-            price=item.price,
-            quantity=item.quantity,
-            userId=item.user_id
-        )
-        for item in cart_items
-    ]
+    """Get cart items for a user (with current product names and prices)"""
+    return [_cart_item_schema(item) for item in await cart_rows(db, userId)]
+
+
+@api_router.get("/cart/summary", response_model=CartSummary)
+async def get_cart_summary(userId: str = Query("guest"), db: AsyncSession = Depends(get_db)):
+    """Cart with current prices, stock availability, totals and the free delivery threshold"""
+    return CartSummary(**await cart_summary(db, userId))
 
 
 @api_router.put("/cart/{item_id}", response_model=CartItemSchema)
-async def update_cart_item(item_id: str, update_data: CartItemUpdate, db: AsyncSession = Depends(get_db)):
+async def update_cart_item(item_id: str, update_data: CartItemUpdate, db: AsyncSession = Depends(get_write_db)):
     """Update cart item quantity"""
     result = await db.execute(select(CartItem).where(CartItem.id == item_id))
     cart_item = result.scalar_one_or_none()
@@ -435,7 +485,7 @@ async def update_cart_item(item_id: str, update_data: CartItemUpdate, db: AsyncS
 
 
 @api_router.delete("/cart/{item_id}")
-async def delete_cart_item(item_id: str, db: AsyncSession = Depends(get_db)):
+async def delete_cart_item(item_id: str, db: AsyncSession = Depends(get_write_db)):
     """Remove item from cart"""
     result = await db.execute(select(CartItem).where(CartItem.id == item_id))
     cart_item = result.scalar_one_or_none()
@@ -450,7 +500,7 @@ async def delete_cart_item(item_id: str, db: AsyncSession = Depends(get_db)):
 
 
 @api_router.delete("/cart/clear/{userId}")
-async def clear_cart(userId: str = "guest", db: AsyncSession = Depends(get_db)):
+async def clear_cart(userId: str = "guest", db: AsyncSession = Depends(get_write_db)):
     """Clear all items from cart for a user"""
     await db.execute(delete(CartItem).where(CartItem.user_id == userId))
     await db.commit()
@@ -460,72 +510,82 @@ async def clear_cart(userId: str = "guest", db: AsyncSession = Depends(get_db)):
 
 # ==================== WISHLIST ENDPOINTS ====================
 
+def _wishlist_item_schema(item) -> WishlistItemSchema:
+    return WishlistItemSchema(
+        id=item.id,
+        productId=item.product_id,
+        userId=item.user_id,
+        createdAt=item.created_at
+    )
+
+
 @api_router.post("/wishlist/add", response_model=WishlistItemSchema)
-async def add_to_wishlist(wishlist_input: WishlistItemCreate, db: AsyncSession = Depends(get_db)):
-    """Add item to wishlist"""
-    # Check if product exists
-    result = await db.execute(select(Product).where(Product.id == wishlist_input.productId))
-    product = result.scalar_one_or_none()
-    
-    if not product:
+async def add_to_wishlist(wishlist_input: WishlistItemCreate, db: AsyncSession = Depends(get_write_db)):
+    """Add item to wishlist (returns the existing item if already there)"""
+    try:
+        [item] = await add_wishlist_items(db, wishlist_input.userId, [wishlist_input.productId])
+    except ProductNotFound:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Product not found")
+    await db.commit()
     
-    # Check if already in wishlist
-    result = await db.execute(
-        select(WishlistItem).where(
-            and_(
-                WishlistItem.product_id == wishlist_input.productId,
-                WishlistItem.user_id == wishlist_input.userId
-            )
-        )
-    )
-    existing = result.scalar_one_or_none()
-    
-    if existing:
-        return WishlistItemSchema(
-            id=existing.id,
-            productId=existing.product_id,
-            userId=existing.user_id,
-            createdAt=existing.created_at
-        )
-    
-    # Add to wishlist
-    wishlist_item = WishlistItem(
-        product_id=wishlist_input.productId,
-        user_id=wishlist_input.userId
-    )
+    return _wishlist_item_schema(item)
+
+
+@api_router.post("/wishlist/items", response_model=List[WishlistItemSchema])
+async def add_to_wishlist_batch(items_input: WishlistItemsUpdate, db: AsyncSession = Depends(get_write_db)):
+    """Add several products to a wishlist in one request"""
+    try:
+        items = await add_wishlist_items(db, items_input.userId, items_input.productIds)
+    except ProductNotFound as e:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    await db.commit()
     
-    db.add(wishlist_item)
+    return [_wishlist_item_schema(item) for item in items]
+
+
+@api_router.post("/wishlist/remove")
+async def remove_from_wishlist_batch(items_input: WishlistItemsUpdate, db: AsyncSession = Depends(get_write_db)):
+    """Remove several products from a wishlist in one request"""
+    removed = await remove_wishlist_items(db, items_input.userId, items_input.productIds)
     await db.commit()
-    await db.refresh(wishlist_item)
     
-    return WishlistItemSchema(
-        id=wishlist_item.id,
-        productId=wishlist_item.product_id,
-        userId=wishlist_item.user_id,
-        createdAt=wishlist_item.created_at
-    )
+    return {"message": "Items removed from wishlist", "removed": removed}
+
+
+@api_router.get("/wishlist/contains", response_model=List[str])
+async def get_wishlist_contains(
+    ids: str = Query(..., description="Comma-separated product ids"),
+    userId: str = Query("guest"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Which of the given products are in the wishlist (for heart icons on a product grid)"""
+    return await wishlist_contains(db, userId, _parse_ids(ids))
 
 
 @api_router.get("/wishlist", response_model=List[WishlistItemSchema])
-async def get_wishlist(userId: str = Query("guest"), db: AsyncSession = Depends(get_db)):
+async def get_wishlist(
+    userId: str = Query("guest"),
+    expand: Optional[str] = Query(None, description="'product' to embed each item's product"),
+    db: AsyncSession = Depends(get_db)
+):
     """Get wishlist items for a user"""
+    if expand == "product":
+        result = await db.execute(
+            select(WishlistItem, Product)
+            .outerjoin(Product, Product.id == WishlistItem.product_id)
+            .where(WishlistItem.user_id == userId)
+        )
+        return json_response(wishlist_json(result.all()))
+    
     result = await db.execute(select(WishlistItem).where(WishlistItem.user_id == userId))
-    wishlist_items = result.scalars().all()
     
-    return [
-        WishlistItemSchema(
-            id=item.id,
-            productId=item.product_id,
-            userId=item.user_id,
-            createdAt=item.created_at
-        )
-        for item in wishlist_items
-    ]
+    return [_wishlist_item_schema(item) for item in result.scalars().all()]
 
 
 @api_router.delete("/wishlist/{item_id}")
-async def remove_from_wishlist(item_id: str, db: AsyncSession = Depends(get_db)):
+async def remove_from_wishlist(item_id: str, db: AsyncSession = Depends(get_write_db)):
     """Remove item from wishlist"""
     result = await db.execute(select(WishlistItem).where(WishlistItem.id == item_id))
     wishlist_item = result.scalar_one_or_none()
@@ -539,33 +599,108 @@ async def remove_from_wishlist(item_id: str, db: AsyncSession = Depends(get_db))
     return {"message": "Item removed from wishlist"}
 
 
+# ==================== GUEST ENDPOINTS ====================
+
+@api_router.post("/guests/merge")
+async def merge_guest_data(merge_input: GuestMerge, db: AsyncSession = Depends(get_write_db)):
+    """Move a guest visitor's cart and wishlist to a user id"""
+    if not merge_input.guestId.startswith(GUEST_PREFIX):
+        raise HTTPException(status_code=400, detail="guestId must be a per-visitor guest id")
+    if is_guest_id(merge_input.userId):
+        raise HTTPException(status_code=400, detail="userId must not be a guest id")
+    
+    merged = await merge_guest(db, merge_input.guestId, merge_input.userId)
+    await db.commit()
+    
+    return {"message": "Guest data merged", "merged": merged}
+
+
 # ==================== ORDERS ENDPOINTS ====================
 
+async def _replay(db: AsyncSession, scope: str, key: Optional[str], fingerprint: str):
+    """Stored response for a repeated Idempotency-Key, if any"""
+    if key is None:
+        return None
+    try:
+        return await idempotency.replay(db, scope, key, fingerprint)
+    except InvalidIdempotencyKey as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _commit_idempotent(db: AsyncSession, scope: str, key: Optional[str], fingerprint: str, response):
+    """Commit the order together with its stored response.
+
+    Returns the other request's response if a concurrent retry with the
+    same key committed first (this transaction is rolled back). Raises 409
+    if that response can no longer be read back (expired or purged).
+    """
+    if key is not None and not await idempotency.save(db, scope, key, fingerprint, encode_response(response)):
+        await db.rollback()
+        replayed = await _replay(db, scope, key, fingerprint)
+        if replayed is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key was already processed; its response is no longer available",
+            )
+        return replayed
+    await db.commit()
+    return None
+
+
 @api_router.post("/orders", response_model=OrderSchema)
-async def create_order(order_input: OrderCreate, db: AsyncSession = Depends(get_db)):
-    """Create a new order"""
+async def create_order(
+    order_input: OrderCreate,
+    db: AsyncSession = Depends(get_write_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """Create a new order: reserve stock, price it and clear the cart in one transaction"""
+    fingerprint = request_fingerprint(order_input)
+    replayed = await _replay(db, "orders", idempotency_key, fingerprint)
+    if replayed is not None:
+        return replayed
+
+    try:
+        lines = await reserve_stock(db, [(item.productId, item.quantity) for item in order_input.items])
+    except ProductNotFound as e:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail=str(e))
+    except InsufficientStock as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
     order = Order(
         user_id=order_input.userId,
-        items=[item.model_dump() for item in order_input.items],
-        total_amount=order_input.totalAmount,
+        items=lines,
+        total_amount=order_total(lines),
         customer_name=order_input.customerName,
         customer_phone=order_input.customerPhone,
         customer_email=order_input.customerEmail,
         delivery_address=order_input.deliveryAddress,
         delivery_method=order_input.deliveryMethod,
         payment_method=order_input.paymentMethod,
-        notes=order_input.notes
+        notes=order_input.notes,
+        stock_reserved=True
     )
     
     db.add(order)
-    await db.commit()
-    await db.refresh(order)
-    
-    # Clear cart after order
+    await db.flush()
+    order.customer_id = await record_customer_order(
+        db, order.customer_phone, order.customer_name, order.total_amount, order.created_at
+    )
+    db.add_all([
+        OrderItem(
+            order_id=order.id,
+            product_id=line["productId"],
+            product_name=line["productName"],
+            quantity=line["quantity"],
+            unit_price=line["price"]
+        )
+        for line in lines
+    ])
+    await record_order(db, order)
     await db.execute(delete(CartItem).where(CartItem.user_id == order_input.userId))
-    await db.commit()
     
-    return OrderSchema(
+    response = OrderSchema(
         id=order.id,
         userId=order.user_id,
         items=order.items,
@@ -580,6 +715,12 @@ async def create_order(order_input: OrderCreate, db: AsyncSession = Depends(get_
         notes=order.notes,
         createdAt=order.created_at
     )
+    replayed = await _commit_idempotent(db, "orders", idempotency_key, fingerprint, response)
+    if replayed is not None:
+        return replayed
+    dashboard_aggregates.invalidate()
+    catalog.adjust_stock({line["productId"]: -line["quantity"] for line in lines})
+    return response
 
 
 @api_router.get("/orders", response_model=List[OrderSchema])
@@ -639,36 +780,48 @@ async def get_order(order_id: str, db: AsyncSession = Depends(get_db)):
 # ==================== QUICK ORDER ENDPOINTS ====================
 
 @api_router.post("/quick-order", response_model=QuickOrderSchema)
-async def create_quick_order(order_input: QuickOrderCreate, db: AsyncSession = Depends(get_db)):
-    """Create a quick order (one-click purchase)"""
-    # Get product details
-    result = await db.execute(select(Product).where(Product.id == order_input.productId))
-    product = result.scalar_one_or_none()
-    
-    if not product:
+async def create_quick_order(
+    order_input: QuickOrderCreate,
+    db: AsyncSession = Depends(get_write_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """Create a quick order (one-click purchase), reserving its stock"""
+    fingerprint = request_fingerprint(order_input)
+    replayed = await _replay(db, "quick-order", idempotency_key, fingerprint)
+    if replayed is not None:
+        return replayed
+
+    try:
+        [line] = await reserve_stock(db, [(order_input.productId, order_input.quantity)])
+    except ProductNotFound:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Check stock
-    if product.stock < order_input.quantity:
+    except InsufficientStock:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
     # Create quick order
     quick_order = QuickOrder(
-        product_id=order_input.productId,
-        product_name=product.name,
-        product_image=product.image,
-        price=product.price,
-        quantity=order_input.quantity,
+        product_id=line["productId"],
+        product_name=line["productName"],
+        product_image=line["productImage"],
+        price=line["price"],
+        quantity=line["quantity"],
         customer_name=order_input.customerName,
         customer_phone=order_input.customerPhone,
-        notes=order_input.notes
+        notes=order_input.notes,
+        stock_reserved=True
     )
     
     db.add(quick_order)
-    await db.commit()
-    await db.refresh(quick_order)
+    await db.flush()
+    quick_order.customer_id = await record_customer_order(
+        db, quick_order.customer_phone, quick_order.customer_name,
+        quick_order.price * quick_order.quantity, quick_order.created_at
+    )
+    await record_quick_order(db, quick_order)
     
-    return QuickOrderSchema(
+    response = QuickOrderSchema(
         id=quick_order.id,
         productId=quick_order.product_id,
         productName=quick_order.product_name,
@@ -681,6 +834,12 @@ async def create_quick_order(order_input: QuickOrderCreate, db: AsyncSession = D
         notes=quick_order.notes,
         createdAt=quick_order.created_at
     )
+    replayed = await _commit_idempotent(db, "quick-order", idempotency_key, fingerprint, response)
+    if replayed is not None:
+        return replayed
+    dashboard_aggregates.invalidate()
+    catalog.adjust_stock({line["productId"]: -line["quantity"]})
+    return response
 
 
 @api_router.get("/quick-orders", response_model=List[QuickOrderSchema])
@@ -689,7 +848,11 @@ async def get_quick_orders(phone: Optional[str] = Query(None), db: AsyncSession
     query = select(QuickOrder).order_by(QuickOrder.created_at.desc())
     
     if phone:
-        query = query.where(QuickOrder.customer_phone == phone)
+        customer_id = normalize_phone(phone)
+        if customer_id:
+            query = query.where(QuickOrder.customer_id == customer_id)
+        else:
+            query = query.where(QuickOrder.customer_phone == phone)
     
     result = await db.execute(query)
     quick_orders = result.scalars().all()
@@ -764,76 +927,45 @@ async def verify_admin(current_admin: dict = Depends(get_current_admin)):
 
 # ==================== ADMIN DASHBOARD STATS ====================
 
+@api_router.get("/admin/maintenance")
+async def get_maintenance_status(current_admin: dict = Depends(get_current_admin)):
+    """Results of the last background maintenance run (see maintenance.py)"""
+    return {
+        "intervalSeconds": maintenance.interval,
+        "lastRun": maintenance.last_run,
+        "deletedTotal": maintenance.deleted_total,
+    }
+
+
 @api_router.get("/admin/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
     current_admin: dict = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get dashboard statistics"""
-    # Total products
-    total_products_result = await db.execute(select(func.count(Product.id)))
-    total_products = total_products_result.scalar()
-    
-    # Total orders
-    total_orders_result = await db.execute(select(func.count(Order.id)))
-    total_orders = total_orders_result.scalar()
-    
-    # Total revenue
-    revenue_result = await db.execute(select(func.sum(Order.total_amount)))
-    total_revenue = revenue_result.scalar() or 0.0
-    
-    # Pending orders
-    pending_orders_result = await db.execute(
-        select(func.count(Order.id)).where(Order.status == "pending")
-    )
-    pending_orders = pending_orders_result.scalar()
-    
-    # Low stock products (less than 10)
-    low_stock_result = await db.execute(
-        select(func.count(Product.id)).where(Product.stock < 10)
-    )
-    low_stock_products = low_stock_result.scalar()
-    
-    # Total categories
-    total_categories_result = await db.execute(select(func.count(Category.id)))
-    total_categories = total_categories_result.scalar()
+    """Get dashboard statistics (shared cached aggregates, see admin_stats.py)"""
+    stats = await dashboard_aggregates.get(db)
     
     return DashboardStats(
-        totalProducts=total_products,
-        totalOrders=total_orders,
-        totalRevenue=total_revenue,
-        pendingOrders=pending_orders,
-        lowStockProducts=low_stock_products,
-        totalCategories=total_categories
+        totalProducts=stats["total_products"],
+        totalOrders=stats["total_orders"],
+        totalRevenue=float(stats["total_amount"]),
+        pendingOrders=stats["pending"],
+        lowStockProducts=stats["low_stock_products"],
+        totalCategories=stats["total_categories"]
     )
 
 
 @api_router.get("/admin/revenue-chart", response_model=List[RevenueData])
 async def get_revenue_chart(
-    days: int = Query(7, ge=1, le=30),
+    days: int = Query(7, ge=1, le=MAX_CHART_DAYS),
     current_admin: dict = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get revenue data for chart (last N days)"""
-    revenue_data = []
-    
-    for i in range(days):
-        date = datetime.utcnow().date() - timedelta(days=days - i - 1)
-        
-        # Get orders for this date
-        result = await db.execute(
-            select(func.sum(Order.total_amount)).where(
-                func.date(Order.created_at) == date
-            )
-        )
-        revenue = result.scalar() or 0.0
-        
-        revenue_data.append(RevenueData(
-            date=date.isoformat(),
-            revenue=revenue
-        ))
-    
-    return revenue_data
+    """Get revenue data for chart (last N days in the shop's timezone)"""
+    return [
+        RevenueData(date=day["date"], revenue=day["revenue"])
+        for day in await daily_order_totals(db, days)
+    ]
 
 
 @api_router.get("/admin/top-products", response_model=List[TopProduct])
@@ -842,27 +974,8 @@ async def get_top_products(
     current_admin: dict = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get top selling products"""
-    # This is a simplified version - in production you'd track actual sales
-    result = await db.execute(
-        select(Product).order_by(Product.stock.asc()).limit(limit)
-    )
-    products = result.scalars().all()
-    
-    top_products = []
-    for product in products:
-        # Simulate sales data (100 - stock = sold)
-        sales = max(0, 100 - product.stock)
-        revenue = sales * product.price
-        
-        top_products.append(TopProduct(
-            id=product.id,
-            name=product.name,
-            sales=sales,
-            revenue=revenue
-        ))
-    
-    return top_products
+    """Get top selling products (units sold from order lines and quick orders)"""
+    return [TopProduct(**product) for product in await top_products(db, limit)]
 
 
 # ==================== ADMIN ORDERS MANAGEMENT ====================
@@ -910,17 +1023,43 @@ async def update_order_status(
     order_id: str,
     status_update: OrderStatusUpdate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update order status (admin only)"""
-    result = await db.execute(select(Order).where(Order.id == order_id))
+    result = await db.execute(select(Order).where(Order.id == order_id).with_for_update())
     order = result.scalar_one_or_none()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    old_status = order.status
+    # Orders placed before checkout reserved stock have nothing to give back
+    stock_changed = bool(order.stock_reserved) and (
+        (old_status == "cancelled") != (status_update.status == "cancelled")
+    )
+    if stock_changed:
+        result = await db.execute(
+            select(OrderItem.product_id, OrderItem.quantity).where(OrderItem.order_id == order_id)
+        )
+        items = result.all()
+        sign = 1 if status_update.status == "cancelled" else -1
+        stock_deltas = {product_id: sign * quantity for product_id, quantity in merge_quantities(items).items()}
+        if status_update.status == "cancelled":
+            await release_stock(db, items)
+        else:
+            try:
+                await reserve_stock(db, items)
+            except (ProductNotFound, InsufficientStock) as e:
+                await db.rollback()
+                raise HTTPException(status_code=409, detail=f"Cannot reopen order: {e}")
+    
     order.status = status_update.status
+    await record_status_change(db, order, old_status)
+    await record_customer_status_change(db, order, old_status)
     await db.commit()
+    dashboard_aggregates.invalidate()
+    if stock_changed:
+        catalog.adjust_stock(stock_deltas)
     await db.refresh(order)
     
     return OrderSchema(
@@ -948,103 +1087,39 @@ async def get_orders_stats(
     db: AsyncSession = Depends(get_db)
 ):
     """Get orders statistics (admin only)"""
-    # Total orders
-    total_orders_result = await db.execute(select(func.count(Order.id)))
-    total_orders = total_orders_result.scalar()
-    
-    # Completed orders
-    completed_orders_result = await db.execute(
-        select(func.count(Order.id)).where(Order.status == "delivered")
-    )
-    completed_orders = completed_orders_result.scalar()
+    stats = await dashboard_aggregates.get(db)
     
-    # Cancelled orders
-    cancelled_orders_result = await db.execute(
-        select(func.count(Order.id)).where(Order.status == "cancelled")
-    )
-    cancelled_orders = cancelled_orders_result.scalar()
-    
-    # Pending orders
-    pending_orders_result = await db.execute(
-        select(func.count(Order.id)).where(Order.status.in_(["pending", "confirmed", "processing"]))
-    )
-    pending_orders = pending_orders_result.scalar()
-    
-    # Total revenue (only delivered orders)
-    revenue_result = await db.execute(
-        select(func.sum(Order.total_amount)).where(Order.status == "delivered")
-    )
-    total_revenue = revenue_result.scalar() or 0.0
-    
-    # Average order value
-    average_order_value = total_revenue / completed_orders if completed_orders > 0 else 0.0
-    
-    # Today's orders
-    today = datetime.utcnow().date()
-    today_orders_result = await db.execute(
-        select(func.count(Order.id)).where(func.date(Order.created_at) == today)
-    )
-    today_orders = today_orders_result.scalar()
-    
-    # Today's revenue
-    today_revenue_result = await db.execute(
-        select(func.sum(Order.total_amount)).where(
-            and_(
-                func.date(Order.created_at) == today,
-                Order.status == "delivered"
-            )
-        )
-    )
-    today_revenue = today_revenue_result.scalar() or 0.0
+    completed_orders = stats["delivered"]
+    total_revenue = float(stats["delivered_amount"])
     
     return OrderStats(
-        totalOrders=total_orders,
+        totalOrders=stats["total_orders"],
         completedOrders=completed_orders,
-        cancelledOrders=cancelled_orders,
-        pendingOrders=pending_orders,
+        cancelledOrders=stats["cancelled"],
+        pendingOrders=sum(stats[status] for status in OPEN_STATUSES),
         totalRevenue=total_revenue,
-        averageOrderValue=average_order_value,
-        todayOrders=today_orders,
-        todayRevenue=today_revenue
+        averageOrderValue=total_revenue / completed_orders if completed_orders > 0 else 0.0,
+        todayOrders=stats["today_orders"],
+        todayRevenue=float(stats["today_delivered_amount"]),
+        pending=stats["pending"],
+        processing=stats["processing"],
+        shipped=stats["shipped"],
+        delivered=stats["delivered"],
+        cancelled=stats["cancelled"]
     )
 
 
 @api_router.get("/admin/orders/chart", response_model=List[OrdersChartData])
 async def get_orders_chart(
-    days: int = Query(7, ge=1, le=30),
+    days: int = Query(7, ge=1, le=MAX_CHART_DAYS),
     current_admin: dict = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get orders chart data (last N days)"""
-    chart_data = []
-    
-    for i in range(days):
-        date = datetime.utcnow().date() - timedelta(days=days - i - 1)
-        
-        # Get orders count for this date
-        orders_result = await db.execute(
-            select(func.count(Order.id)).where(func.date(Order.created_at) == date)
-        )
-        orders_count = orders_result.scalar()
-        
-        # Get revenue for this date (delivered orders)
-        revenue_result = await db.execute(
-            select(func.sum(Order.total_amount)).where(
-                and_(
-                    func.date(Order.created_at) == date,
-                    Order.status == "delivered"
-                )
-            )
-        )
-        revenue = revenue_result.scalar() or 0.0
-        
-        chart_data.append(OrdersChartData(
-            date=date.isoformat(),
-            orders=orders_count,
-            revenue=revenue
-        ))
-    
-    return chart_data
+    """Get orders chart data (last N days in the shop's timezone)"""
+    return [
+        OrdersChartData(date=day["date"], orders=day["orders"], revenue=day["delivered_revenue"])
+        for day in await daily_order_totals(db, days)
+    ]
 
 
 @api_router.get("/admin/orders/by-status", response_model=List[OrdersByStatus])
@@ -1052,29 +1127,19 @@ async def get_orders_by_status(
     current_admin: dict = Depends(get_current_admin),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get orders distribution by status"""
-    # Get total orders
-    total_orders_result = await db.execute(select(func.count(Order.id)))
-    total_orders = total_orders_result.scalar() or 1  # Avoid division by zero
-    
-    # Get count for each status
-    statuses = ["pending", "confirmed", "processing", "shipped", "delivered", "cancelled"]
-    status_data = []
-    
-    for status in statuses:
-        count_result = await db.execute(
-            select(func.count(Order.id)).where(Order.status == status)
-        )
-        count = count_result.scalar()
-        percentage = (count / total_orders) * 100 if total_orders > 0 else 0
-        
-        status_data.append(OrdersByStatus(
+    """Get orders distribution by status (known statuses first, then any others)"""
+    by_status = (await dashboard_aggregates.get(db))["by_status"]
+    total_orders = sum(by_status.values())
+    
+    return [
+        OrdersByStatus(
             status=status,
             count=count,
-            percentage=percentage
-        ))
-    
-    return status_data
+            percentage=(count / total_orders) * 100 if total_orders > 0 else 0
+        )
+        for status, count in by_status.items()
+        if count or status in ORDER_STATUSES
+    ]
 
 
 @api_router.get("/admin/orders/top-customers", response_model=List[TopCustomer])
@@ -1084,25 +1149,18 @@ async def get_top_customers(
     db: AsyncSession = Depends(get_db)
 ):
     """Get top customers by order count and spending"""
-    # Group by customer and get stats
     result = await db.execute(
-        select(
-            Order.customer_name,
-            Order.customer_phone,
-            func.count(Order.id).label('order_count'),
-            func.sum(Order.total_amount).label('total_spent')
-        )
-        .group_by(Order.customer_name, Order.customer_phone)
-        .order_by(func.count(Order.id).desc())
+        select(Customer)
+        .where(Customer.order_count > 0)
+        .order_by(Customer.order_count.desc(), Customer.total_spent.desc())
         .limit(limit)
     )
-    
-    customers = result.all()
+    customers = result.scalars().all()
     
     return [
         TopCustomer(
-            name=customer.customer_name,
-            phone=customer.customer_phone,
+            name=customer.name,
+            phone=customer.phone,
             totalOrders=customer.order_count,
             totalSpent=customer.total_spent or 0.0
         )
@@ -1113,10 +1171,11 @@ async def get_top_customers(
 # ==================== ADMIN CATEGORIES MANAGEMENT ====================
 
 @api_router.post("/admin/categories", response_model=CategorySchema)
+@invalidates("categories")
 async def create_category(
     category_input: CategoryCreate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Create a new category (admin only)"""
     category = Category(
@@ -1128,6 +1187,7 @@ async def create_category(
     db.add(category)
     await db.commit()
     await db.refresh(category)
+    await catalog.refresh(db)
     
     return CategorySchema(
         id=category.id,
@@ -1138,11 +1198,12 @@ async def create_category(
 
 
 @api_router.put("/admin/categories/{category_id}", response_model=CategorySchema)
+@invalidates("categories")
 async def update_category(
     category_id: str,
     update_data: CategoryUpdate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Update a category (admin only)"""
     result = await db.execute(select(Category).where(Category.id == category_id))
@@ -1160,6 +1221,7 @@ async def update_category(
     
     await db.commit()
     await db.refresh(category)
+    await catalog.refresh(db)
     
     return CategorySchema(
         id=category.id,
@@ -1170,10 +1232,11 @@ async def update_category(
 
 
 @api_router.delete("/admin/categories/{category_id}")
+@invalidates("categories")
 async def delete_category(
     category_id: str,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Delete a category (admin only)"""
     result = await db.execute(select(Category).where(Category.id == category_id))
@@ -1184,6 +1247,7 @@ async def delete_category(
     
     await db.delete(category)
     await db.commit()
+    await catalog.refresh(db)
     
     return {"message": "Category deleted successfully"}
 
@@ -1318,7 +1382,8 @@ from models import SiteSettings as SiteSettingsSchema, SiteSettingsUpdate
 from database import SiteSettings
 
 @api_router.get("/settings")
-async def get_public_settings(db: AsyncSession = Depends(get_db)):
+@cached("settings")
+async def get_public_settings(db: AsyncSession = Depends(read_db(max_lag=1))):
     """Get site settings (public access)"""
     result = await db.execute(select(SiteSettings).where(SiteSettings.id == "main"))
     settings = result.scalar_one_or_none()
@@ -1425,14 +1490,16 @@ async def get_admin_settings(
 
 
 @api_router.post("/admin/site-settings")
+@invalidates("settings")
 async def save_admin_settings(
     settings_update: SiteSettingsUpdate,
     current_admin: dict = Depends(get_current_admin),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
     """Save site settings (admin only)"""
-    result = await db.execute(select(SiteSettings).where(SiteSettings.id == "main"))
+    result = await db.execute(select(SiteSettings).where(SiteSettings.id == "main").with_for_update())
     settings = result.scalar_one_or_none()
+    old_timezone = (settings.settings_data or {}).get("timezone") if settings else None
     
     if settings:
         # Update existing settings
@@ -1447,7 +1514,14 @@ async def save_admin_settings(
         )
         db.add(settings)
     
+    # daily_sales rows are keyed by local date; re-bucket them for the new timezone
+    timezone_changed = settings_update.settings_data.get("timezone") != old_timezone
+    if timezone_changed:
+        await db.flush()
+        await rebuild_daily_sales(db)
     await db.commit()
+    if timezone_changed:
+        dashboard_aggregates.invalidate()
     await db.refresh(settings)
     
     return {
@@ -1471,6 +1545,7 @@ app.add_middleware(
     allow_origins=["https://plantshop-manager.preview.emergentagent.com", "http://localhost:3000", "http://localhost:8001"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -1485,11 +1560,15 @@ logger = logging.getLogger(__name__)
 async def startup():
     """Initialize database on startup"""
     await init_db()
+    async with write_session() as db:
+        await ensure_daily_sales(db)
     logger.info("Database initialized")
+    maintenance.start()
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """Close database connection on shutdown"""
+    await maintenance.stop()
     await close_db()
     logger.info("Database connection closed")
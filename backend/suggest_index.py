@@ -0,0 +1,168 @@
+"""
+In-process prefix index for search-as-you-type suggestions
+
+Terms from product names, articles and category names (analyzed with
+search_analysis, so Latin/Cyrillic and inflections match) are kept in a
+sorted array. A prefix lookup is a bisect plus a bounded scan, so
+suggestions never touch the database once the index is loaded.
+
+The index is per process: it is loaded lazily from the DB on first use and
+patched incrementally by the product write handlers (upsert/remove). It is
+reloaded when older than SUGGEST_INDEX_TTL, so changes made by other worker
+processes, scripts or direct DB edits show up without a restart.
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Product
+from search_analysis import analyze
+
+# How many matching products to consider before ranking
+CANDIDATES_PER_RESULT = 4
+# Same default as CATALOG_SNAPSHOT_TTL
+SUGGEST_INDEX_TTL = float(os.environ.get("SUGGEST_INDEX_TTL", "60"))
+
+
+class SuggestIndex:
+    """Sorted (term, product_id) array with per-product payloads"""
+
+    def __init__(self, ttl: float = SUGGEST_INDEX_TTL):
+        self.ttl = ttl
+        self.loaded = False
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self._keys: List[str] = []
+        self._ids: List[str] = []
+        self._terms: Dict[str, List[str]] = {}
+        self._payloads: Dict[str, dict] = {}
+
+    # ============ BUILDING ============
+
+    @staticmethod
+    def _product_terms(name: str, article: str, category: str) -> List[str]:
+        """Unique index terms for a product, name terms first"""
+        terms = []
+        for term in analyze(name) + analyze(article) + analyze(category):
+            if term not in terms:
+                terms.append(term)
+        return terms
+
+    def _register(self, product) -> List[str]:
+        """Store terms and payload for a product, return its terms"""
+        terms = self._product_terms(product.name, product.article, product.category)
+        self._terms[product.id] = terms
+        self._payloads[product.id] = {
+            "id": product.id,
+            "name": product.name,
+            "image": product.image,
+            "price": product.price,
+        }
+        return terms
+
+    def remove(self, product_id: str) -> None:
+        """Drop a product from the index"""
+        terms = self._terms.pop(product_id, None)
+        self._payloads.pop(product_id, None)
+        if not terms:
+            return
+        for term in terms:
+            pos = bisect_left(self._keys, term)
+            while pos < len(self._keys) and self._keys[pos] == term:
+                if self._ids[pos] == product_id:
+                    del self._keys[pos]
+                    del self._ids[pos]
+                    break
+                pos += 1
+
+    def upsert(self, product) -> None:
+        """Add or refresh a product after it was created or updated"""
+        if not self.loaded:
+            return
+        self.remove(product.id)
+        for term in self._register(product):
+            pos = bisect_left(self._keys, term)
+            self._keys.insert(pos, term)
+            self._ids.insert(pos, product.id)
+
+    def rebuild(self, products) -> None:
+        """Replace the whole index"""
+        entries = []
+        self._terms = {}
+        self._payloads = {}
+        for product in products:
+            entries.extend((term, product.id) for term in self._register(product))
+        entries.sort()
+        self._keys = [term for term, _ in entries]
+        self._ids = [product_id for _, product_id in entries]
+        self.loaded = True
+        self._built_at = time.monotonic()
+
+    async def load(self, db: AsyncSession) -> None:
+        """Build the index from the products table"""
+        result = await db.execute(
+            select(
+                Product.id, Product.name, Product.article,
+                Product.category, Product.image, Product.price
+            )
+        )
+        self.rebuild(result.all())
+
+    def is_stale(self) -> bool:
+        return not self.loaded or time.monotonic() - self._built_at > self.ttl
+
+    async def refresh_if_stale(self, db: AsyncSession) -> None:
+        """(Re)load the index if it is missing or older than the TTL"""
+        if not self.is_stale():
+            return
+        async with self._lock:
+            # Another request may have reloaded it while this one waited
+            if self.is_stale():
+                await self.load(db)
+
+    # ============ LOOKUP ============
+
+    def _prefix_range(self, prefix: str):
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        return lo, hi
+
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        """Top products whose terms start with every query term"""
+        terms = analyze(query)
+        if not terms or not self._keys:
+            return []
+
+        # Drive the scan from the narrowest prefix range
+        ranges = [self._prefix_range(term) for term in terms]
+        lo, hi = min(ranges, key=lambda r: r[1] - r[0])
+
+        max_candidates = limit * CANDIDATES_PER_RESULT
+        candidates = []
+        seen = set()
+        for pos in range(lo, hi):
+            product_id = self._ids[pos]
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            product_terms = self._terms[product_id]
+            if all(any(t.startswith(term) for t in product_terms) for term in terms):
+                candidates.append(product_id)
+                if len(candidates) >= max_candidates:
+                    break
+
+        # Products whose name starts with the query rank first
+        first = terms[0]
+        candidates.sort(key=lambda pid: (
+            not self._terms[pid][0].startswith(first),
+            self._payloads[pid]["name"].lower(),
+        ))
+        return [self._payloads[pid] for pid in candidates[:limit]]
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,90 @@
+"""
+Shared fixtures for the database-backed tests
+
+The tests run against a throwaway SQLite file, set up before any backend
+module is imported so the real database is never touched.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import httpx
+import pytest
+
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="platansad-tests-")
+atexit.register(shutil.rmtree, _TEST_DB_DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_TEST_DB_DIR) / 'test.db'}"
+os.environ.setdefault("MAINTENANCE_INTERVAL", "0")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # One event loop for the whole session: the engine's connections belong to it
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def database(anyio_backend):
+    from database import close_db, init_db
+
+    await init_db()
+    yield
+    await close_db()
+
+
+@pytest.fixture
+async def client(database):
+    """API client, signed in as admin"""
+    from admin_auth import get_current_admin
+    from server import app
+
+    app.dependency_overrides[get_current_admin] = lambda: {"username": "admin", "role": "admin"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+async def make_product(database):
+    """Create a product (stock, price and any other column); returns its id"""
+    from catalog_snapshot import catalog
+    from database import Product, write_session
+
+    async def make(stock: int = 10, price: float = 100.0, **fields) -> str:
+        product_id = str(uuid.uuid4())
+        values = {
+            "name": f"Test product {product_id[:8]}",
+            "article": product_id,
+            "image": "/test.webp",
+            "category": "test",
+            "description": "",
+            **fields,
+        }
+        async with write_session() as session:
+            session.add(Product(id=product_id, price=price, stock=stock, **values))
+            await session.commit()
+        # Written behind the API's back: make the snapshot pick it up
+        catalog.expire()
+        return product_id
+
+    return make
+
+
+@pytest.fixture
+def product_stock(database):
+    """Current stock of a product"""
+    from sqlalchemy import select
+    from database import AsyncSessionLocal, Product
+
+    async def stock(product_id: str) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Product.stock).where(Product.id == product_id))
+            return result.scalar_one()
+
+    return stock
@@ -0,0 +1,407 @@
+"""
+Admin dashboard tests
+Tests: counters and charts from the daily_sales rollup agree with plain queries
+over the orders; the rollup stays equal to a rebuild, also across timezone changes;
+top products from order_items and the legacy order line backfill; orders by status;
+top customers keyed by normalised phone
+"""
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+from admin_stats import ORDER_STATUSES, OPEN_STATUSES, dashboard_aggregates, local_today, shop_timezone, to_local_date
+from customers import normalize_phone
+from database import (
+    AsyncSessionLocal, Category, DailySales, Order, OrderItem, Product, QuickOrder, SiteSettings,
+    _backfill_order_items, engine, write_lock, write_session,
+)
+from sales_rollup import rebuild_daily_sales
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+async def rollup(database, monkeypatch):
+    """Start from a rollup that matches the orders (other tests insert orders directly)
+    and read fresh counters on every request"""
+    async with write_session() as db:
+        await rebuild_daily_sales(db)
+        await db.commit()
+    monkeypatch.setattr(dashboard_aggregates, "ttl", 0)
+
+
+async def place_order(client, product_id: str, quantity: int, phone: str = "+380500000003") -> dict:
+    response = await client.post("/api/orders", json={
+        "items": [{"productId": product_id, "productName": "", "productImage": "", "price": 0, "quantity": quantity}],
+        "customerName": "Test",
+        "customerPhone": phone,
+        "deliveryAddress": "Kyiv",
+        "deliveryMethod": "pickup",
+        "paymentMethod": "cash",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def set_status(client, order_id: str, status: str):
+    response = await client.put(f"/api/admin/orders/{order_id}/status", json={"status": status})
+    assert response.status_code == 200, response.text
+
+
+async def seed_orders(client, make_product):
+    """A few orders in every status"""
+    first = await make_product(stock=100, price=120.0)
+    second = await make_product(stock=100, price=35.5)
+    for status, quantity in [("pending", 1), ("confirmed", 2), ("processing", 1),
+                             ("shipped", 3), ("delivered", 2), ("delivered", 1), ("cancelled", 4)]:
+        order = await place_order(client, first, quantity)
+        await set_status(client, order["id"], status)
+        order = await place_order(client, second, quantity + 1)
+        if status != "pending":
+            await set_status(client, order["id"], status)
+    return first, second
+
+
+async def set_created_at(order_ids, created_at: datetime):
+    """Move orders in time (behind the API's back, so rebuild the rollup)"""
+    async with write_session() as db:
+        await db.execute(update(Order).where(Order.id.in_(order_ids)).values(created_at=created_at))
+        await rebuild_daily_sales(db)
+        await db.commit()
+
+
+async def backdate(order_ids, days: int):
+    await set_created_at(order_ids, datetime.utcnow() - timedelta(days=days))
+
+
+async def stored_orders() -> list:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(Order))).scalars().all()
+
+
+async def local_days(orders) -> dict:
+    """Local (shop timezone) date of each order, and today's"""
+    async with AsyncSessionLocal() as db:
+        tz = await shop_timezone(db)
+    return {order.id: to_local_date(order.created_at, tz) for order in orders}, local_today(tz)
+
+
+class TestCounters:
+    """/admin/stats and /admin/orders/stats"""
+
+    async def test_dashboard_stats(self, client, make_product):
+        await seed_orders(client, make_product)
+
+        orders = await stored_orders()
+        async with AsyncSessionLocal() as db:
+            products = (await db.execute(select(func.count(Product.id)))).scalar()
+            low_stock = (await db.execute(select(func.count(Product.id)).where(Product.stock < 10))).scalar()
+            categories = (await db.execute(select(func.count(Category.id)))).scalar()
+
+        stats = (await client.get("/api/admin/stats")).json()
+        assert stats["totalOrders"] == len(orders)
+        assert stats["totalRevenue"] == pytest.approx(sum(o.total_amount for o in orders))
+        assert stats["pendingOrders"] == sum(o.status == "pending" for o in orders)
+        assert stats["totalProducts"] == products
+        assert stats["lowStockProducts"] == low_stock
+        assert stats["totalCategories"] == categories
+
+    async def test_orders_stats(self, client, make_product):
+        await seed_orders(client, make_product)
+
+        orders = await stored_orders()
+        days, today = await local_days(orders)
+        statuses = Counter(o.status for o in orders)
+        delivered = [o for o in orders if o.status == "delivered"]
+        revenue = sum(o.total_amount for o in delivered)
+
+        stats = (await client.get("/api/admin/orders/stats")).json()
+        assert stats["totalOrders"] == len(orders)
+        assert stats["completedOrders"] == len(delivered)
+        assert stats["cancelledOrders"] == statuses["cancelled"]
+        assert stats["pendingOrders"] == sum(statuses[s] for s in OPEN_STATUSES)
+        assert stats["totalRevenue"] == pytest.approx(revenue)
+        assert stats["averageOrderValue"] == pytest.approx(revenue / len(delivered))
+        assert stats["todayOrders"] == sum(days[o.id] == today for o in orders)
+        assert stats["todayRevenue"] == pytest.approx(sum(o.total_amount for o in delivered if days[o.id] == today))
+        for status in ("pending", "processing", "shipped", "delivered", "cancelled"):
+            assert stats[status] == statuses[status]
+
+    async def test_counters_follow_status_change(self, client, make_product, monkeypatch):
+        """Cached counters are dropped when an order changes status"""
+        monkeypatch.setattr(dashboard_aggregates, "ttl", 3600)
+        product_id = await make_product(stock=10)
+        order = await place_order(client, product_id, 1)
+        before = (await client.get("/api/admin/orders/stats")).json()
+
+        await set_status(client, order["id"], "delivered")
+        after = (await client.get("/api/admin/orders/stats")).json()
+        assert after["delivered"] == before["delivered"] + 1
+        assert after["pending"] == before["pending"] - 1
+        assert after["totalRevenue"] == pytest.approx(before["totalRevenue"] + order["totalAmount"])
+
+
+class TestCharts:
+    """/admin/revenue-chart and /admin/orders/chart"""
+
+    @pytest.fixture
+    async def history(self, client, make_product):
+        """Orders spread over the last couple of weeks"""
+        product_id = await make_product(stock=100, price=80.0)
+        for days_ago, status in [(0, "pending"), (1, "delivered"), (1, "cancelled"),
+                                 (3, "delivered"), (6, "shipped"), (12, "delivered"), (40, "delivered")]:
+            order = await place_order(client, product_id, days_ago % 3 + 1)
+            await set_status(client, order["id"], status)
+            if days_ago:
+                await backdate([order["id"]], days_ago)
+
+    async def expected(self, days: int) -> list:
+        orders = await stored_orders()
+        local, today = await local_days(orders)
+        chart = []
+        for i in range(days):
+            day = today - timedelta(days=days - i - 1)
+            on_day = [o for o in orders if local[o.id] == day]
+            chart.append({
+                "date": day.isoformat(),
+                "orders": len(on_day),
+                "revenue": sum(o.total_amount for o in on_day),
+                "delivered": sum(o.total_amount for o in on_day if o.status == "delivered"),
+            })
+        return chart
+
+    @pytest.mark.parametrize("days", [1, 7, 30])
+    async def test_revenue_chart(self, client, history, days):
+        response = await client.get("/api/admin/revenue-chart", params={"days": days})
+        assert response.status_code == 200, response.text
+
+        expected = await self.expected(days)
+        assert [d["date"] for d in response.json()] == [d["date"] for d in expected]
+        assert [d["revenue"] for d in response.json()] == pytest.approx([d["revenue"] for d in expected])
+
+    @pytest.mark.parametrize("days", [1, 7, 30])
+    async def test_orders_chart(self, client, history, days):
+        response = await client.get("/api/admin/orders/chart", params={"days": days})
+        assert response.status_code == 200, response.text
+
+        expected = await self.expected(days)
+        assert [(d["date"], d["orders"]) for d in response.json()] == [(d["date"], d["orders"]) for d in expected]
+        assert [d["revenue"] for d in response.json()] == pytest.approx([d["delivered"] for d in expected])
+
+
+async def rollup_rows() -> dict:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(DailySales))).scalars().all()
+    return {
+        (row.date, row.status): (row.order_count, pytest.approx(row.revenue), row.quick_order_count)
+        for row in rows
+        if row.order_count or row.quick_order_count
+    }
+
+
+async def expected_rollup() -> dict:
+    """(local day, status) totals straight from orders and quick orders"""
+    orders = await stored_orders()
+    async with AsyncSessionLocal() as db:
+        quick_orders = (await db.execute(select(QuickOrder))).scalars().all()
+        tz = await shop_timezone(db)
+    totals = {}
+    for order in orders:
+        key = (to_local_date(order.created_at, tz), order.status)
+        count, revenue, quick = totals.get(key, (0, 0.0, 0))
+        totals[key] = (count + 1, revenue + order.total_amount, quick)
+    for quick_order in quick_orders:
+        key = (to_local_date(quick_order.created_at, tz), quick_order.status)
+        count, revenue, quick = totals.get(key, (0, 0.0, 0))
+        totals[key] = (count, revenue, quick + 1)
+    return {key: (count, pytest.approx(revenue), quick) for key, (count, revenue, quick) in totals.items()}
+
+
+class TestDailySales:
+    """daily_sales maintained by the order handlers"""
+
+    @pytest.fixture
+    async def shop_timezone_setting(self, client):
+        """Restore the site settings after the test changes the timezone"""
+        async with AsyncSessionLocal() as db:
+            settings = (await db.execute(select(SiteSettings.settings_data))).scalar_one_or_none() or {}
+        yield settings
+        response = await client.post("/api/admin/site-settings", json={"settings_data": settings})
+        assert response.status_code == 200, response.text
+
+    async def test_incremental_updates_match_orders(self, client, make_product):
+        product_id = await make_product(stock=100, price=60.0)
+        await seed_orders(client, make_product)
+        response = await client.post("/api/quick-order", json={
+            "productId": product_id, "quantity": 2, "customerName": "Quick", "customerPhone": "0500000004",
+        })
+        assert response.status_code == 200, response.text
+        order = await place_order(client, product_id, 1)
+        await set_status(client, order["id"], "cancelled")
+        await set_status(client, order["id"], "pending")
+
+        assert await rollup_rows() == await expected_rollup()
+
+    async def test_timezone_change_rebuilds(self, client, make_product, shop_timezone_setting):
+        """An order placed late in the UTC evening is on the next day in Kyiv"""
+        product_id = await make_product(stock=10)
+        order = await place_order(client, product_id, 1)
+        late_evening = datetime.utcnow().replace(hour=22, minute=30) - timedelta(days=2)
+        await set_created_at([order["id"]], late_evening)
+
+        for timezone in ("Europe/Kiev", "UTC"):
+            settings = dict(shop_timezone_setting, timezone=timezone)
+            response = await client.post("/api/admin/site-settings", json={"settings_data": settings})
+            assert response.status_code == 200, response.text
+            day = late_evening.date() + timedelta(days=timezone != "UTC")
+            assert (day, "pending") in await rollup_rows()
+            assert await rollup_rows() == await expected_rollup()
+
+        # Later status changes move the order out of the day it was counted on
+        await set_status(client, order["id"], "shipped")
+        rows = await rollup_rows()
+        assert (late_evening.date(), "shipped") in rows
+        assert rows == await expected_rollup()
+
+
+class TestTopProducts:
+    """/admin/top-products"""
+
+    async def test_matches_order_lines(self, client, make_product):
+        """Units and revenue per product from the orders' item lists and quick orders"""
+        best, second, cancelled_only = [await make_product(stock=10000, price=price) for price in (10.0, 7.5, 99.0)]
+        await place_order(client, best, 900)
+        await place_order(client, best, 300)
+        await place_order(client, second, 1000)
+        await set_status(client, (await place_order(client, second, 500))["id"], "cancelled")
+        await set_status(client, (await place_order(client, cancelled_only, 5000))["id"], "cancelled")
+        response = await client.post("/api/quick-order", json={
+            "productId": second, "quantity": 150, "customerName": "Quick", "customerPhone": "0500000005",
+        })
+        assert response.status_code == 200, response.text
+
+        sales, revenue = Counter(), Counter()
+        for order in await stored_orders():
+            if order.status == "cancelled":
+                continue
+            for item in order.items:
+                if item["productId"] in (best, second, cancelled_only):
+                    sales[item["productId"]] += item["quantity"]
+                    revenue[item["productId"]] += item["quantity"] * item["price"]
+        sales[second] += 150
+        revenue[second] += 150 * 7.5
+
+        response = await client.get("/api/admin/top-products", params={"limit": 20})
+        assert response.status_code == 200, response.text
+        top = response.json()
+        assert [(p["id"], p["sales"]) for p in top[:2]] == [(best, 1200), (second, 1150)] == [
+            (pid, sales[pid]) for pid in (best, second)
+        ]
+        assert [p["revenue"] for p in top[:2]] == pytest.approx([revenue[best], revenue[second]])
+        assert cancelled_only not in {p["id"] for p in top}
+        assert [(-p["sales"], p["id"]) for p in top] == sorted((-p["sales"], p["id"]) for p in top)
+
+    async def test_legacy_lines_backfilled(self, make_product):
+        """Orders stored before order_items get rows from their JSON lines; junk lines are skipped"""
+        product_id = await make_product()
+        async with write_session() as db:
+            order = Order(
+                items=[
+                    {"productId": product_id, "productName": "Old", "price": "50", "quantity": "2"},
+                    {"productId": product_id, "productName": "Old", "price": 50, "quantity": None},
+                    {"productId": product_id, "productName": "Old", "price": 50, "quantity": "lots"},
+                    "junk",
+                ],
+                total_amount=150.0,
+                customer_name="Legacy",
+                customer_phone="+380500000007",
+                delivery_address="Kyiv",
+                delivery_method="pickup",
+                payment_method="cash",
+            )
+            db.add(order)
+            await db.commit()
+
+        async with write_lock():
+            async with engine.begin() as connection:
+                await connection.run_sync(_backfill_order_items)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price)
+                .where(OrderItem.order_id == order.id)
+                .order_by(OrderItem.quantity.desc())
+            )
+            assert result.all() == [(product_id, 2, 50.0), (product_id, 1, 50.0)]
+
+
+class TestOrdersByStatus:
+    """/admin/orders/by-status"""
+
+    async def test_matches_status_counts(self, client, make_product):
+        await seed_orders(client, make_product)
+        order = await place_order(client, await make_product(), 1)
+        await set_status(client, order["id"], "on-hold")
+
+        statuses = Counter(o.status for o in await stored_orders())
+        total = sum(statuses.values())
+        unknown = sorted(status for status in statuses if status not in ORDER_STATUSES)
+
+        response = await client.get("/api/admin/orders/by-status")
+        assert response.status_code == 200, response.text
+        by_status = response.json()
+        # Workflow statuses always listed, in order, then any others
+        assert [s["status"] for s in by_status] == list(ORDER_STATUSES) + unknown
+        assert {s["status"]: s["count"] for s in by_status} == {
+            status: statuses[status] for status in list(ORDER_STATUSES) + unknown
+        }
+        assert [s["percentage"] for s in by_status] == pytest.approx(
+            [statuses[s["status"]] / total * 100 for s in by_status]
+        )
+
+
+class TestTopCustomers:
+    """/admin/orders/top-customers and phone normalisation"""
+
+    @pytest.mark.parametrize("phone", [
+        "+380671234567", "380671234567", "0671234567", "80671234567",
+        "+38 (067) 123-45-67", "067 123 45 67",
+    ])
+    def test_normalize_phone(self, phone):
+        assert normalize_phone(phone) == "+380671234567"
+
+    @pytest.mark.parametrize("phone, expected", [("", None), (None, None), ("+48 601 234 567", "+48601234567")])
+    def test_normalize_other_phones(self, phone, expected):
+        assert normalize_phone(phone) == expected
+
+    async def test_spellings_of_one_phone_are_one_customer(self, client, make_product):
+        local = f"{random.randrange(10**7):07d}"
+        phone = f"+38067{local}"
+        product_id = await make_product(stock=100, price=40.0)
+        orders = [
+            await place_order(client, product_id, 1, phone=f"+380 67 {local}"),
+            await place_order(client, product_id, 2, phone=f"067{local}"),
+            await place_order(client, product_id, 3, phone=f"8067{local}"),
+        ]
+        response = await client.post("/api/quick-order", json={
+            "productId": product_id, "quantity": 4, "customerName": "Quick", "customerPhone": f"(067) {local}",
+        })
+        assert response.status_code == 200, response.text
+        await set_status(client, orders[1]["id"], "cancelled")
+
+        async with AsyncSessionLocal() as db:
+            quick_orders = (await db.execute(select(QuickOrder))).scalars().all()
+        purchases = [o.total_amount for o in await stored_orders()
+                     if normalize_phone(o.customer_phone) == phone and o.status != "cancelled"]
+        purchases += [q.price * q.quantity for q in quick_orders
+                      if normalize_phone(q.customer_phone) == phone and q.status != "cancelled"]
+
+        response = await client.get("/api/admin/orders/top-customers", params={"limit": 50})
+        assert response.status_code == 200, response.text
+        customers = [c for c in response.json() if c["phone"] == phone]
+        assert len(customers) == 1
+        assert customers[0]["totalOrders"] == len(purchases) == 3
+        assert customers[0]["totalSpent"] == pytest.approx(sum(purchases)) == 320.0
@@ -0,0 +1,127 @@
+"""
+Cart, wishlist and guest merge tests
+Tests: insert-or-increment adds, cart summary with current prices, idempotent wishlist
+adds, wishlist with embedded products, guest cart/wishlist merge
+"""
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def visitor_id(prefix: str = "user") -> str:
+    return f"{prefix}-{uuid.uuid4()}"
+
+
+class TestCart:
+    """POST /api/cart/add and PUT /api/cart/{id}"""
+
+    async def test_same_product_added_twice_merged(self, client, make_product):
+        product_id = await make_product()
+        user_id = visitor_id()
+
+        first = await client.post("/api/cart/add", json={"productId": product_id, "quantity": 1, "userId": user_id})
+        second = await client.post("/api/cart/add", json={"productId": product_id, "quantity": 2, "userId": user_id})
+        assert first.status_code == second.status_code == 200
+        assert second.json()["id"] == first.json()["id"]
+
+        cart = (await client.get("/api/cart", params={"userId": user_id})).json()
+        assert [(item["productId"], item["quantity"]) for item in cart] == [(product_id, 3)]
+
+    @pytest.mark.parametrize("quantity", [0, -1])
+    async def test_non_positive_quantity_update_rejected(self, client, make_product, quantity):
+        product_id = await make_product()
+        user_id = visitor_id()
+        item = (await client.post("/api/cart/add", json={"productId": product_id, "userId": user_id})).json()
+
+        response = await client.put(f"/api/cart/{item['id']}", json={"quantity": quantity})
+        assert response.status_code == 422
+
+
+class TestCartSummary:
+    """GET /api/cart/summary"""
+
+    async def test_current_prices_and_availability(self, client, make_product):
+        repriced = await make_product(price=100.0, stock=10)
+        short = await make_product(price=25.5, stock=1)
+        deleted = await make_product(price=40.0)
+        user_id = visitor_id()
+        response = await client.post("/api/cart/items", json={"userId": user_id, "items": [
+            {"productId": repriced, "quantity": 3},
+            {"productId": short, "quantity": 2},
+            {"productId": deleted, "quantity": 1},
+        ]})
+        assert response.status_code == 200, response.text
+
+        await client.put(f"/api/products/{repriced}", json={"price": 120.0})
+        await client.delete(f"/api/products/{deleted}")
+
+        summary = (await client.get("/api/cart/summary", params={"userId": user_id})).json()
+        lines = {line["productId"]: line for line in summary["items"]}
+        assert (lines[repriced]["price"], lines[repriced]["lineTotal"], lines[repriced]["inStock"]) == (120.0, 360.0, True)
+        assert (lines[short]["lineTotal"], lines[short]["stock"], lines[short]["inStock"]) == (51.0, 1, False)
+        assert (lines[deleted]["available"], lines[deleted]["lineTotal"]) == (False, 0.0)
+        assert summary["itemCount"] == 5
+        assert summary["subtotal"] == 411.0
+        assert summary["amountToFreeDelivery"] == round(max(summary["freeDeliveryFrom"] - 411.0, 0.0), 2)
+        assert summary["freeDelivery"] == (411.0 >= summary["freeDeliveryFrom"])
+
+
+class TestWishlist:
+    """POST /api/wishlist/add"""
+
+    async def test_adding_twice_is_noop(self, client, make_product):
+        product_id = await make_product()
+        user_id = visitor_id()
+
+        first = await client.post("/api/wishlist/add", json={"productId": product_id, "userId": user_id})
+        second = await client.post("/api/wishlist/add", json={"productId": product_id, "userId": user_id})
+        assert first.status_code == second.status_code == 200
+        assert second.json()["id"] == first.json()["id"]
+
+        wishlist = (await client.get("/api/wishlist", params={"userId": user_id})).json()
+        assert [item["productId"] for item in wishlist] == [product_id]
+
+    async def test_expand_product(self, client, make_product):
+        """?expand=product embeds current product data, null once the product is deleted"""
+        kept = await make_product(price=70.0)
+        deleted = await make_product()
+        user_id = visitor_id()
+        await client.post("/api/wishlist/items", json={"userId": user_id, "productIds": [kept, deleted]})
+        await client.put(f"/api/products/{kept}", json={"price": 75.0})
+        await client.delete(f"/api/products/{deleted}")
+
+        response = await client.get("/api/wishlist", params={"userId": user_id, "expand": "product"})
+        assert response.status_code == 200, response.text
+        products = {item["productId"]: item["product"] for item in response.json()}
+        assert products[kept]["price"] == 75.0
+        assert products[deleted] is None
+
+
+class TestGuestMerge:
+    """POST /api/guests/merge"""
+
+    async def test_merge_combines_quantities_and_removes_guest_rows(self, client, make_product):
+        shared = await make_product()
+        guest_only = await make_product()
+        guest_id = visitor_id("guest")
+        user_id = visitor_id()
+
+        await client.post("/api/cart/add", json={"productId": shared, "quantity": 2, "userId": user_id})
+        await client.post("/api/cart/add", json={"productId": shared, "quantity": 3, "userId": guest_id})
+        await client.post("/api/cart/add", json={"productId": guest_only, "quantity": 1, "userId": guest_id})
+        await client.post("/api/wishlist/add", json={"productId": shared, "userId": user_id})
+        await client.post("/api/wishlist/add", json={"productId": shared, "userId": guest_id})
+
+        response = await client.post("/api/guests/merge", json={"guestId": guest_id, "userId": user_id})
+        assert response.status_code == 200, response.text
+        assert response.json()["merged"] == {"cart": 2, "wishlist": 1}
+
+        cart = (await client.get("/api/cart", params={"userId": user_id})).json()
+        assert {item["productId"]: item["quantity"] for item in cart} == {shared: 5, guest_only: 1}
+        wishlist = (await client.get("/api/wishlist", params={"userId": user_id})).json()
+        assert [item["productId"] for item in wishlist] == [shared]
+
+        assert (await client.get("/api/cart", params={"userId": guest_id})).json() == []
+        assert (await client.get("/api/wishlist", params={"userId": guest_id})).json() == []
@@ -0,0 +1,125 @@
+"""
+Checkout stock tests
+Tests: conditional stock reservation, stock returned on cancel and taken again on reopen
+"""
+import uuid
+
+import pytest
+
+from checkout import InsufficientStock, reserve_stock
+from database import write_session
+
+pytestmark = pytest.mark.anyio
+
+
+async def place_order(client, product_id: str, quantity: int) -> dict:
+    response = await client.post("/api/orders", json={
+        "items": [{"productId": product_id, "productName": "", "productImage": "", "price": 0, "quantity": quantity}],
+        "customerName": "Test",
+        "customerPhone": "+380500000000",
+        "deliveryAddress": "Kyiv",
+        "deliveryMethod": "pickup",
+        "paymentMethod": "cash",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def set_status(client, order_id: str, status: str):
+    return await client.put(f"/api/admin/orders/{order_id}/status", json={"status": status})
+
+
+class TestReserveStock:
+    """checkout.reserve_stock()"""
+
+    async def test_oversold_reservation_rejected(self, make_product, product_stock):
+        """A short product fails the whole reservation and no stock is taken"""
+        plenty = await make_product(stock=10)
+        short = await make_product(stock=2)
+
+        async with write_session() as db:
+            with pytest.raises(InsufficientStock):
+                await reserve_stock(db, [(plenty, 1), (short, 3)])
+            await db.rollback()
+
+        assert await product_stock(plenty) == 10
+        assert await product_stock(short) == 2
+
+
+class TestOrderStatusStock:
+    """PUT /api/admin/orders/{id}/status and product stock"""
+
+    async def test_cancel_restores_stock(self, client, make_product, product_stock):
+        product_id = await make_product(stock=5)
+        order = await place_order(client, product_id, 3)
+        assert await product_stock(product_id) == 2
+
+        response = await set_status(client, order["id"], "cancelled")
+        assert response.status_code == 200, response.text
+        assert await product_stock(product_id) == 5
+
+        response = await set_status(client, order["id"], "confirmed")
+        assert response.status_code == 200, response.text
+        assert await product_stock(product_id) == 2
+
+    async def test_reopen_without_stock_rejected(self, client, make_product, product_stock):
+        """Moving out of `cancelled` needs the stock back; the status is left unchanged"""
+        product_id = await make_product(stock=3)
+        order = await place_order(client, product_id, 3)
+        await set_status(client, order["id"], "cancelled")
+        await place_order(client, product_id, 2)
+
+        response = await set_status(client, order["id"], "pending")
+        assert response.status_code == 409
+        assert await product_stock(product_id) == 1
+
+    async def test_legacy_order_leaves_stock_alone(self, client, make_product, product_stock):
+        """Orders that never reserved stock (placed before checkout did) give none back"""
+        from database import Order, OrderItem
+
+        product_id = await make_product(stock=4)
+        async with write_session() as db:
+            order = Order(
+                items=[{"productId": product_id, "productName": "", "productImage": "", "price": 100.0, "quantity": 3}],
+                total_amount=300.0,
+                customer_name="Legacy",
+                customer_phone="+380500000009",
+                delivery_address="Kyiv",
+                delivery_method="pickup",
+                payment_method="cash",
+            )
+            db.add(order)
+            await db.flush()
+            db.add(OrderItem(order_id=order.id, product_id=product_id, product_name="", quantity=3, unit_price=100.0))
+            await db.commit()
+
+        assert (await set_status(client, order.id, "cancelled")).status_code == 200
+        assert await product_stock(product_id) == 4
+        assert (await set_status(client, order.id, "pending")).status_code == 200
+        assert await product_stock(product_id) == 4
+
+
+class TestOrderResponse:
+    """GET /api/orders with stored orders"""
+
+    async def test_legacy_zero_quantity_item_listed(self, client):
+        """Only new orders must have positive quantities; stored ones are still returned"""
+        from database import Order
+
+        user_id = f"legacy-{uuid.uuid4()}"
+        async with write_session() as db:
+            db.add(Order(
+                user_id=user_id,
+                items=[{"productId": "gone", "productName": "", "productImage": "", "price": 10.0, "quantity": 0}],
+                total_amount=0.0,
+                customer_name="Legacy",
+                customer_phone="+380500000008",
+                delivery_address="Kyiv",
+                delivery_method="pickup",
+                payment_method="cash",
+            ))
+            await db.commit()
+
+        response = await client.get("/api/orders", params={"userId": user_id})
+        assert response.status_code == 200, response.text
+        assert response.json()[0]["items"][0]["quantity"] == 0
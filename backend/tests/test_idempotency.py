@@ -0,0 +1,46 @@
+"""
+Idempotency-Key tests for order creation
+Tests: replay of the stored response, key reused with a different body
+"""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def order_body(product_id: str, quantity: int = 1) -> dict:
+    return {
+        "items": [{"productId": product_id, "productName": "", "productImage": "", "price": 0, "quantity": quantity}],
+        "customerName": "Test",
+        "customerPhone": "+380500000001",
+        "deliveryAddress": "Kyiv",
+        "deliveryMethod": "pickup",
+        "paymentMethod": "cash",
+    }
+
+
+class TestIdempotencyKey:
+    """POST /api/orders with an Idempotency-Key header"""
+
+    async def test_repeated_key_replays_response(self, client, make_product, product_stock):
+        """A retry gets the first order back and does not order again"""
+        product_id = await make_product(stock=5)
+        headers = {"Idempotency-Key": f"retry-{product_id}"}
+
+        first = await client.post("/api/orders", json=order_body(product_id, 2), headers=headers)
+        retry = await client.post("/api/orders", json=order_body(product_id, 2), headers=headers)
+
+        assert first.status_code == retry.status_code == 200
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json() == first.json()
+        assert await product_stock(product_id) == 3
+
+    async def test_key_reused_for_different_body_rejected(self, client, make_product, product_stock):
+        product_id = await make_product(stock=5)
+        headers = {"Idempotency-Key": f"reused-{product_id}"}
+
+        first = await client.post("/api/orders", json=order_body(product_id, 1), headers=headers)
+        other = await client.post("/api/orders", json=order_body(product_id, 3), headers=headers)
+
+        assert first.status_code == 200
+        assert other.status_code == 422
+        assert await product_stock(product_id) == 4
@@ -0,0 +1,87 @@
+"""
+Background maintenance tests
+Tests: one run purges only rows past their cutoffs, VACUUM keeps the search index usable
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import maintenance
+from database import AsyncSessionLocal, CartItem, IdempotencyKey, WishlistItem, write_session
+from guests import GUEST_TTL_DAYS
+from idempotency import idempotency
+
+pytestmark = pytest.mark.anyio
+
+
+def days_ago(days: float) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+async def existing(model, ids) -> set:
+    async with AsyncSessionLocal() as db:
+        column = model.key if model is IdempotencyKey else model.id
+        return set((await db.execute(select(column).where(column.in_(ids)))).scalars())
+
+
+class TestRunOnce:
+    """MaintenanceTask.run_once()"""
+
+    async def test_purges_expired_rows_only(self, database):
+        expired, recent = days_ago(GUEST_TTL_DAYS + 1), days_ago(GUEST_TTL_DAYS - 1)
+        carts = {
+            f"guest-{uuid.uuid4()}": expired,
+            f"guest-{uuid.uuid4()}": recent,
+            f"user-{uuid.uuid4()}": expired,  # signed-in carts never expire
+        }
+        keys = {
+            str(uuid.uuid4()): datetime.utcnow() - timedelta(seconds=idempotency.ttl + 60),
+            str(uuid.uuid4()): datetime.utcnow() - timedelta(seconds=idempotency.ttl - 60),
+        }
+        async with write_session() as db:
+            for user_id, idle_since in carts.items():
+                db.add(CartItem(id=user_id, product_id="p", product_name="", product_image="",
+                                price=1.0, user_id=user_id, updated_at=idle_since))
+                db.add(WishlistItem(id=user_id, product_id="p", user_id=user_id, created_at=idle_since))
+            for key, created_at in keys.items():
+                db.add(IdempotencyKey(scope="orders", key=key, request_hash="", status_code=200,
+                                      response_body=b"{}", created_at=created_at))
+            await db.commit()
+
+        task = maintenance.MaintenanceTask(interval=0)
+        run = await task.run_once()
+
+        [expired_guest, recent_guest, user] = carts
+        [expired_key, recent_key] = keys
+        assert await existing(CartItem, carts) == {recent_guest, user}
+        assert await existing(WishlistItem, carts) == {recent_guest, user}
+        assert await existing(IdempotencyKey, keys) == {recent_key}
+        assert run["error"] is None
+        assert min(run["deleted"].values()) >= 1
+        assert task.deleted_total == run["deleted"] == run["deletedTotal"]
+
+    async def test_search_index_rebuilt_after_vacuum(self, client, make_product, monkeypatch):
+        """VACUUM may renumber product rowids; the FTS index is rebuilt to match"""
+        rebuilds = []
+        rebuild = maintenance.rebuild_search_index
+        monkeypatch.setattr(maintenance, "rebuild_search_index", lambda conn: (rebuilds.append(1), rebuild(conn)))
+        monkeypatch.setattr(maintenance, "VACUUM_INTERVAL", 0)
+        monkeypatch.setattr(maintenance, "VACUUM_FREE_RATIO", 0)
+        word = "vacuum" + uuid.uuid4().hex[:6].translate(str.maketrans("0123456789", "ghijklmnop"))
+        doomed = [await make_product(name=f"Filler {i}", description="x" * 5000) for i in range(20)]
+        kept = await make_product(name=f"Туя {word}")
+        for product_id in doomed:
+            assert (await client.delete(f"/api/products/{product_id}")).status_code == 200
+
+        task = maintenance.MaintenanceTask(interval=0)
+        run = await task.run_once()
+        assert (run["vacuumed"], len(rebuilds)) == (True, 1)
+        response = await client.get("/api/products", params={"search": word})
+        assert [p["id"] for p in response.json()] == [kept]
+
+        # Not due again within VACUUM_INTERVAL
+        monkeypatch.setattr(maintenance, "VACUUM_INTERVAL", 3600)
+        run = await task.run_once()
+        assert (run["vacuumed"], len(rebuilds)) == (False, 1)
@@ -0,0 +1,59 @@
+"""
+Response cache tests for the public GET endpoints
+Tests: LRU eviction, TTL expiry, tag invalidation, stale-store protection
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from response_cache import ResponseCache
+
+
+def store(cache, key, body, tags=("settings",)):
+    cache.set(key, body, tags, cache.generation(tags))
+
+
+class TestResponseCache:
+    """response_cache.ResponseCache behaviour"""
+
+    def test_hit_after_store(self):
+        cache = ResponseCache(ttl=60, max_entries=10)
+        store(cache, ("settings", ()), b"{}")
+        assert cache.get(("settings", ())) == b"{}"
+        assert cache.get(("settings", (("lang", "uk"),))) is None
+
+    def test_least_recently_used_evicted(self):
+        """Reading an entry keeps it; the oldest unread one is evicted"""
+        cache = ResponseCache(ttl=60, max_entries=2)
+        store(cache, ("a", ()), b"a")
+        store(cache, ("b", ()), b"b")
+        cache.get(("a", ()))
+        store(cache, ("c", ()), b"c")
+        assert cache.get(("a", ())) == b"a"
+        assert cache.get(("b", ())) is None
+        assert cache.get(("c", ())) == b"c"
+
+    def test_expired_entry_dropped(self):
+        cache = ResponseCache(ttl=0.01, max_entries=10)
+        store(cache, ("a", ()), b"a")
+        time.sleep(0.02)
+        assert cache.get(("a", ())) is None
+
+    def test_invalidate_by_tag(self):
+        """Only entries carrying the invalidated tag are dropped"""
+        cache = ResponseCache(ttl=60, max_entries=10)
+        store(cache, ("categories", ()), b"[]", ("categories",))
+        store(cache, ("settings", ()), b"{}", ("settings",))
+        cache.invalidate("categories")
+        assert cache.get(("categories", ())) is None
+        assert cache.get(("settings", ())) == b"{}"
+
+    def test_response_computed_before_write_not_stored(self):
+        """A body read before an invalidation must not be cached after it"""
+        cache = ResponseCache(ttl=60, max_entries=10)
+        generation = cache.generation(("settings",))
+        cache.invalidate("settings")
+        cache.set(("settings", ()), b"stale", ("settings",), generation)
+        assert cache.get(("settings", ())) is None
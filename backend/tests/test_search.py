@@ -0,0 +1,133 @@
+"""
+Product search endpoint tests
+Tests: full-text index kept in sync with product writes, relevance ranking,
+Latin/Cyrillic and inflected queries, typeahead suggestions
+"""
+import random
+
+import pytest
+
+import server
+from suggest_index import suggest_index
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=[True, False], ids=["snapshot", "sql"])
+def catalog_mode(request, monkeypatch):
+    monkeypatch.setattr(server, "CATALOG_SNAPSHOT_ENABLED", request.param)
+    return request.param
+
+
+def unique_word() -> str:
+    """A made-up word no other product contains"""
+    return "".join(random.choice("bdfklmnprstvz") + random.choice("aiou") for _ in range(5))
+
+
+def product_body(name: str, description: str = "") -> dict:
+    return {
+        "name": name,
+        "article": f"ART-{random.randrange(10**9)}",
+        "price": 100.0,
+        "image": "/test.webp",
+        "category": "test",
+        "description": description,
+    }
+
+
+async def suggest_ids(client, query: str) -> list:
+    response = await client.get("/api/products/suggest", params={"q": query})
+    assert response.status_code == 200, response.text
+    return [s["id"] for s in response.json()]
+
+
+async def search_ids(client, query: str, **params) -> list:
+    response = await client.get("/api/products", params={"search": query, **params})
+    assert response.status_code == 200, response.text
+    return [p["id"] for p in response.json()]
+
+
+class TestSearchIndexSync:
+    """Index triggers follow products created, updated and deleted through the API"""
+
+    async def test_insert_update_delete(self, client, catalog_mode):
+        old_word, new_word = unique_word(), unique_word()
+
+        response = await client.post("/api/products", json=product_body(f"Туя {old_word}"))
+        assert response.status_code == 200, response.text
+        product_id = response.json()["id"]
+        assert await search_ids(client, old_word) == [product_id]
+
+        response = await client.put(f"/api/products/{product_id}", json={"name": f"Туя {new_word}"})
+        assert response.status_code == 200, response.text
+        assert await search_ids(client, old_word) == []
+        assert await search_ids(client, new_word) == [product_id]
+
+        response = await client.put(f"/api/products/{product_id}", json={"description": f"Also {old_word}"})
+        assert response.status_code == 200, response.text
+        assert await search_ids(client, old_word) == [product_id]
+
+        response = await client.delete(f"/api/products/{product_id}")
+        assert response.status_code == 200, response.text
+        assert await search_ids(client, new_word) == []
+
+    async def test_name_match_ranks_first(self, client, catalog_mode):
+        word = unique_word()
+        in_description = (await client.post("/api/products", json=product_body("Plain", f"{word} inside"))).json()["id"]
+        in_name = (await client.post("/api/products", json=product_body(f"Туя {word}"))).json()["id"]
+
+        assert await search_ids(client, word) == [in_name, in_description]
+
+    async def test_no_usable_terms_matches_nothing(self, client, make_product, catalog_mode):
+        await make_product()
+        assert await search_ids(client, "!!! ---") == []
+
+
+class TestSearchAnalysisEndpoint:
+    """Queries go through the same analysis as the indexed text"""
+
+    @pytest.mark.parametrize("query", ["{word} туї", "{word} thuja", "{word} ТУЯМИ"])
+    async def test_spelling_variants_match(self, client, catalog_mode, query):
+        word = unique_word()
+        product_id = (await client.post("/api/products", json=product_body(f"Туя {word}"))).json()["id"]
+
+        assert await search_ids(client, query.format(word=word)) == [product_id]
+
+
+class TestSuggest:
+    """GET /api/products/suggest"""
+
+    async def test_prefix_match(self, client):
+        word = unique_word()
+        named = (await client.post("/api/products", json=product_body(f"{word} Смарагд"))).json()["id"]
+        other = (await client.post("/api/products", json=product_body(f"Туя {word}"))).json()["id"]
+
+        # Name starting with the query ranks first
+        assert await suggest_ids(client, word[:6]) == [named, other]
+        assert await suggest_ids(client, f"{word[:6]} смар") == [named]
+        assert await suggest_ids(client, word[1:7]) == []
+
+    async def test_upsert_and_remove(self, client):
+        old_word, new_word = unique_word(), unique_word()
+        await suggest_ids(client, old_word)  # make sure the index is loaded
+        product_id = (await client.post("/api/products", json=product_body(f"Туя {old_word}"))).json()["id"]
+        assert await suggest_ids(client, old_word) == [product_id]
+
+        await client.put(f"/api/products/{product_id}", json={"name": f"Туя {new_word}", "price": 55})
+        assert await suggest_ids(client, old_word) == []
+        response = await client.get("/api/products/suggest", params={"q": new_word})
+        assert [(s["id"], s["price"]) for s in response.json()] == [(product_id, 55)]
+
+        await client.delete(f"/api/products/{product_id}")
+        assert await suggest_ids(client, new_word) == []
+
+    async def test_reload_after_ttl(self, client, make_product, monkeypatch):
+        """Products written outside the API show up once the index is older than the TTL"""
+        word = unique_word()
+        monkeypatch.setattr(suggest_index, "ttl", 3600)
+        await suggest_ids(client, word)
+        product_id = await make_product(name=f"Туя {word}")
+        assert await suggest_ids(client, word) == []
+
+        monkeypatch.setattr(suggest_index, "ttl", 0)
+        assert await suggest_ids(client, word) == [product_id]
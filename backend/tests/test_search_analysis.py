@@ -0,0 +1,45 @@
+"""
+Search analysis pipeline tests for PlatanSad catalog search
+Tests: normalisation, transliteration, letter folding, stemming
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from search_analysis import analyze, to_search_text
+
+
+class TestSearchAnalysis:
+    """search_analysis.analyze() equivalence tests"""
+
+    @pytest.mark.parametrize("query", ["туя смарагд", "tuya smaragd", "Туя СМАРАГД", "tuja smarahd"])
+    def test_latin_and_cyrillic_match(self, query):
+        """Latin and Cyrillic spellings reduce to the same terms"""
+        assert analyze(query)[0] == analyze("туя смарагд")[0]
+
+    @pytest.mark.parametrize("word", ["Туї", "туй", "туями", "туях", "thuja"])
+    def test_inflections_share_stem(self, word):
+        """Inflected forms reduce to the same stem"""
+        assert analyze(word) == analyze("туя")
+
+    @pytest.mark.parametrize("word", ["м'ята", "мʼята", "м’ята", "м`ята"])
+    def test_apostrophes_normalised(self, word):
+        """All apostrophe variants are treated the same"""
+        assert analyze(word) == analyze("мята")
+
+    def test_numbers_not_stemmed(self):
+        """Tokens with digits (sizes, articles) are kept as-is"""
+        assert analyze("185-190см") == ["185", "190см"]
+
+    def test_empty_input(self):
+        """Empty and punctuation-only input produce no terms"""
+        assert analyze("") == []
+        assert analyze("%%--") == []
+        assert to_search_text(None, "") == ""
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,81 @@
+"""
+Wishlist writes and membership checks
+
+Adding is an idempotent insert-or-ignore on the unique (user_id, product_id)
+index, for one product or many:
+
+    INSERT INTO wishlist (...) SELECT ... FROM products WHERE id IN (...)
+    ON CONFLICT (user_id, product_id) DO NOTHING
+
+so repeated or concurrent taps never create duplicates. Removal and
+membership checks are single set-based statements over the same index.
+"""
+import uuid
+from datetime import datetime
+from typing import Iterable, List
+
+from sqlalchemy import DateTime, case, delete, literal, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from checkout import ProductNotFound
+from database import Product, WishlistItem, insert_for
+
+
+async def add_wishlist_items(db: AsyncSession, user_id: str, product_ids: Iterable[str]) -> List[Row]:
+    """Add products to a wishlist (already present ones are kept as they are);
+    returns the wishlist rows in request order. Raises ProductNotFound."""
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        return []
+
+    wishlist = WishlistItem.__table__
+    new_ids = {product_id: str(uuid.uuid4()) for product_id in product_ids}
+    insert = insert_for(db.get_bind().dialect.name)
+    await db.execute(
+        insert(wishlist)
+        .from_select(
+            ["id", "product_id", "user_id", "created_at"],
+            select(
+                case(new_ids, value=Product.id),
+                Product.id,
+                literal(user_id),
+                literal(datetime.utcnow(), DateTime),
+            ).where(Product.id.in_(product_ids)),
+        )
+        .on_conflict_do_nothing(index_elements=[wishlist.c.user_id, wishlist.c.product_id])
+    )
+
+    result = await db.execute(
+        select(wishlist).where(wishlist.c.user_id == user_id, wishlist.c.product_id.in_(product_ids))
+    )
+    rows = {row.product_id: row for row in result}
+    unknown = [product_id for product_id in product_ids if product_id not in rows]
+    if unknown:
+        raise ProductNotFound(f"Product not found: {', '.join(unknown)}")
+    return [rows[product_id] for product_id in product_ids]
+
+
+async def remove_wishlist_items(db: AsyncSession, user_id: str, product_ids: Iterable[str]) -> int:
+    """Remove products from a wishlist; returns the number of rows deleted"""
+    result = await db.execute(
+        delete(WishlistItem).where(
+            WishlistItem.user_id == user_id,
+            WishlistItem.product_id.in_(list(product_ids)),
+        )
+    )
+    return result.rowcount or 0
+
+
+async def wishlist_contains(db: AsyncSession, user_id: str, product_ids: List[str]) -> List[str]:
+    """The subset of product_ids that are in the wishlist, in request order"""
+    if not product_ids:
+        return []
+    result = await db.execute(
+        select(WishlistItem.product_id).where(
+            WishlistItem.user_id == user_id,
+            WishlistItem.product_id.in_(product_ids),
+        )
+    )
+    present = set(result.scalars())
+    return [product_id for product_id in product_ids if product_id in present]
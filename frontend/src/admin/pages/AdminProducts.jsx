@@ -42,7 +42,7 @@ const AdminProducts = () => {
   const loadData = async () => {
     try {
       const [productsData, categoriesData] = await Promise.all([
-        getAllProducts(),
+        getAllProducts({ limit: 500 }),
         getAllCategories()
       ]);
       setProducts(productsData);
@@ -19,6 +19,14 @@ export const cartApi = {
     return response.data;
   },
 
+  // Get cart with current prices, stock and totals
+  getCartSummary: async (userId = 'guest') => {
+    const response = await api.get('/api/cart/summary', {
+      params: { userId }
+    });
+    return response.data;
+  },
+
   // Update cart item quantity
   updateCartItem: async (itemId, quantity) => {
     const response = await api.put(`/api/cart/${itemId}`, { quantity });
@@ -13,6 +13,14 @@ export const productsApi = {
     return response.data;
   },
 
+  // Get several products by id (in the given order)
+  getProductsBatch: async (productIds) => {
+    const response = await api.get('/api/products/batch', {
+      params: { ids: productIds.join(',') }
+    });
+    return response.data;
+  },
+
   // Search products
   searchProducts: async (searchQuery) => {
     const response = await api.get('/api/products', {
@@ -21,6 +29,14 @@ export const productsApi = {
     return response.data;
   },
 
+  // Typeahead suggestions (id, name, image, price) for a search prefix
+  suggestProducts: async (query, limit = 8) => {
+    const response = await api.get('/api/products/suggest', {
+      params: { q: query, limit }
+    });
+    return response.data;
+  },
+
   // Filter products
   filterProducts: async (filters) => {
     const response = await api.get('/api/products', {
@@ -11,9 +11,29 @@ export const wishlistApi = {
   },
 
   // Get wishlist items
-  getWishlist: async (userId = 'guest') => {
+  getWishlist: async (userId = 'guest', expandProducts = false) => {
     const response = await api.get('/api/wishlist', {
-      params: { userId }
+      params: expandProducts ? { userId, expand: 'product' } : { userId }
+    });
+    return response.data;
+  },
+
+  // Add several products at once
+  addManyToWishlist: async (productIds, userId = 'guest') => {
+    const response = await api.post('/api/wishlist/items', { productIds, userId });
+    return response.data;
+  },
+
+  // Remove several products at once
+  removeManyFromWishlist: async (productIds, userId = 'guest') => {
+    const response = await api.post('/api/wishlist/remove', { productIds, userId });
+    return response.data;
+  },
+
+  // Which of the given products are in the wishlist
+  getWishlistContains: async (productIds, userId = 'guest') => {
+    const response = await api.get('/api/wishlist/contains', {
+      params: { ids: productIds.join(','), userId }
     });
     return response.data;
   },
@@ -16,6 +16,7 @@ import { useLocation, useNavigate } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
 import { useWishlist } from '../context/WishlistContext';
 import { categoriesApi } from '../api/categoriesApi';
+import { productsApi } from '../api/productsApi';
 
 const cx = (...c) => c.filter(Boolean).join(' ');
 
@@ -437,6 +438,61 @@ function BottomSheet({ open, onClose, label = 'Bottom sheet', containerRef, chil
   );
 }
 
+/* =================== SEARCH SUGGESTIONS =================== */
+const SUGGEST_MIN_LENGTH = 2;
+const SUGGEST_DEBOUNCE_MS = 150;
+
+function useProductSuggestions(query, enabled) {
+  const [suggestions, setSuggestions] = useState([]);
+
+  useEffect(() => {
+    const q = query.trim();
+    if (!enabled || q.length < SUGGEST_MIN_LENGTH) {
+      setSuggestions([]);
+      return undefined;
+    }
+
+    let alive = true;
+    const timer = setTimeout(async () => {
+      try {
+        const data = await productsApi.suggestProducts(q);
+        if (alive) setSuggestions(Array.isArray(data) ? data : []);
+      } catch (error) {
+        if (alive) setSuggestions([]);
+      }
+    }, SUGGEST_DEBOUNCE_MS);
+
+    return () => {
+      alive = false;
+      clearTimeout(timer);
+    };
+  }, [query, enabled]);
+
+  return suggestions;
+}
+
+const SearchSuggestions = ({ suggestions, onSelect }) => {
+  if (!suggestions.length) return null;
+
+  return (
+    <ul className="mt-2 border border-gray-100 rounded-2xl overflow-hidden divide-y divide-gray-100" data-testid="search-suggestions">
+      {suggestions.map((product) => (
+        <li key={product.id}>
+          <button
+            type="button"
+            onClick={() => onSelect(product)}
+            className="w-full flex items-center gap-3 px-4 py-2.5 text-left hover:bg-green-50 transition-colors focus:outline-none focus:bg-green-50"
+          >
+            <img src={product.image} alt="" className="w-10 h-10 rounded-lg object-cover bg-gray-100 flex-shrink-0" loading="lazy" />
+            <span className="flex-1 text-sm text-gray-800 line-clamp-2">{product.name}</span>
+            <span className="text-sm font-semibold text-gray-900 whitespace-nowrap">{product.price?.toLocaleString()} ₴</span>
+          </button>
+        </li>
+      ))}
+    </ul>
+  );
+};
+
 const Header = () => {
   const navigate = useNavigate();
   const location = useLocation();
@@ -537,6 +593,16 @@ const Header = () => {
     [navigate, searchQuery]
   );
 
+  const suggestions = useProductSuggestions(searchQuery, isSearchOpen);
+  const handleSuggestionSelect = useCallback(
+    (product) => {
+      navigate(`/products/${product.id}`);
+      setIsSearchOpen(false);
+      setSearchQuery('');
+    },
+    [navigate]
+  );
+
   const popularTerms = useMemo(() => ['Туя', 'Бонсай', 'Нівакі', 'Самшит'], []);
   const overlayTransition = reducedMotion ? 'duration-0' : 'duration-300';
 
@@ -1152,6 +1218,8 @@ const Header = () => {
               </button>
             </div>
 
+            <SearchSuggestions suggestions={suggestions} onSelect={handleSuggestionSelect} />
+
             <div className="mt-4 flex flex-wrap gap-2">
               <span className="text-sm text-gray-500">Популярні:</span>
               {popularTerms.map((term) => (
@@ -1233,6 +1301,8 @@ const Header = () => {
                   </button>
                 </div>
 
+                <SearchSuggestions suggestions={suggestions} onSelect={handleSuggestionSelect} />
+
                 <div className="mt-6 flex flex-wrap gap-2 justify-center">
                   <span className="text-sm text-gray-500">Популярні:</span>
                   {popularTerms.map((term) => (
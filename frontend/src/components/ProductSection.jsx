@@ -13,7 +13,7 @@ const ProductSection = () => {
     const fetchProducts = async () => {
       try {
         setLoading(true);
-        const data = await productsApi.getProducts();
+        const data = await productsApi.getProducts({ limit: 500 });
         console.log('Products loaded:', data.length);
         setProducts(data);
       } catch (error) {
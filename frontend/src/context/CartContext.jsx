@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
 import { cartApi } from '../api/cartApi';
 import { toast } from 'sonner';
+import { getVisitorId } from '../lib/visitorId';
 
 const CartContext = createContext();
 
@@ -23,7 +24,7 @@ const getProductId = (obj) => {
 export const CartProvider = ({ children }) => {
   const [cartItems, setCartItems] = useState([]);
   const [loading, setLoading] = useState(false);
-  const userId = 'guest';
+  const userId = getVisitorId();
 
   const fetchCart = useCallback(async () => {
     try {
@@ -1,6 +1,7 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
 import { wishlistApi } from '../api/wishlistApi';
 import { toast } from 'sonner';
+import { getVisitorId } from '../lib/visitorId';
 
 const WishlistContext = createContext();
 
@@ -15,7 +16,7 @@ export const useWishlist = () => {
 export const WishlistProvider = ({ children }) => {
   const [wishlistItems, setWishlistItems] = useState([]);
   const [loading, setLoading] = useState(false);
-  const userId = 'guest';
+  const userId = getVisitorId();
 
   // Fetch wishlist on mount
   const fetchWishlist = useCallback(async () => {
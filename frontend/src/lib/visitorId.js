@@ -0,0 +1,23 @@
+const STORAGE_KEY = 'visitorId';
+
+const randomId = () => {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(16)}-${Math.random().toString(16).slice(2)}`;
+};
+
+// Opaque per-visitor id used as userId for the cart, wishlist and orders
+export const getVisitorId = () => {
+  try {
+    let visitorId = localStorage.getItem(STORAGE_KEY);
+    if (!visitorId) {
+      visitorId = `guest-${randomId()}`;
+      localStorage.setItem(STORAGE_KEY, visitorId);
+    }
+    return visitorId;
+  } catch (error) {
+    // Storage unavailable (private mode): fall back to the shared guest cart
+    return 'guest';
+  }
+};
@@ -121,7 +121,7 @@ const CatalogPage = () => {
         const controller = new AbortController();
         abortRef.current = controller;
 
-        const data = await productsApi.getProducts({}, { signal: controller.signal });
+        const data = await productsApi.getProducts({ limit: 500 }, { signal: controller.signal });
         setProducts(Array.isArray(data) ? data : []);
       } catch (error) {
         if (error?.name === 'AbortError') return;
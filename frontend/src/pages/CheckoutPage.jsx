@@ -9,6 +9,7 @@ import {
   MessageSquare, ShoppingBag, Check
 } from 'lucide-react';
 import { searchCities, getWarehouses, popularCities } from '../api/novaPoshtaApi';
+import { getVisitorId } from '../lib/visitorId';
 
 const CheckoutPage = () => {
   const navigate = useNavigate();
@@ -188,7 +189,7 @@ const CheckoutPage = () => {
           quantity: item.quantity
         })),
         totalAmount: cartTotal,
-        userId: 'guest',
+        userId: getVisitorId(),
         paymentStatus: 'pending'
       };
 